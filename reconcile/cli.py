@@ -46,6 +46,17 @@ def terraform(function):
     function = click.option('--print-only/--no-print-only',
                             help='only print the terraform config file.',
                             default=False)(function)
+    function = click.option('--plugin-cache-dir',
+                            help='persistent terraform plugin cache '
+                                 'directory shared by all accounts.',
+                            default=None)(function)
+    function = click.option('--working-dir',
+                            help='directory of per-account terraform '
+                                 'working directories kept between runs.',
+                            default=None)(function)
+    function = click.option('--apply-thread-pool-size',
+                            help='number of accounts to apply in parallel.',
+                            default=5)(function)
 
     return function
 
@@ -118,9 +129,15 @@ def integration(ctx, configfile, dry_run, log_level):
 
 
 @integration.command()
+@click.option('--cache-dir',
+              help='directory to keep GitHub API responses in between runs.')
+@click.option('--graphql/--no-graphql',
+              default=False,
+              help='fetch org teams and members with the GraphQL API.')
 @click.pass_context
-def github(ctx):
-    run_integration(reconcile.github_org.run, ctx.obj['dry_run'])
+def github(ctx, cache_dir, graphql):
+    run_integration(reconcile.github_org.run, ctx.obj['dry_run'], cache_dir,
+                    graphql)
 
 
 @integration.command()
@@ -134,16 +151,19 @@ def github_users(ctx, thread_pool_size, enable_deletion, send_mails):
 
 
 @integration.command()
+@threaded(default=10)
 @click.pass_context
-def openshift_rolebinding(ctx):
-    run_integration(reconcile.openshift_rolebinding.run, ctx.obj['dry_run'])
+def openshift_rolebinding(ctx, thread_pool_size):
+    run_integration(reconcile.openshift_rolebinding.run, ctx.obj['dry_run'],
+                    thread_pool_size)
 
 
 @integration.command()
 @threaded(default=10)
 @click.pass_context
 def openshift_groups(ctx, thread_pool_size):
-    run_integration(reconcile.openshift_groups.run, ctx.obj['dry_run'])
+    run_integration(reconcile.openshift_groups.run, ctx.obj['dry_run'],
+                    thread_pool_size)
 
 
 @integration.command()
@@ -270,11 +290,13 @@ def openshift_resources_annotate(ctx, cluster, namespace, kind, name):
 @threaded(default=20)
 @enable_deletion(default=False)
 @click.pass_context
-def terraform_resources(ctx, print_only, enable_deletion,
-                        io_dir, thread_pool_size):
+def terraform_resources(ctx, print_only, plugin_cache_dir, working_dir,
+                        apply_thread_pool_size, enable_deletion, io_dir,
+                        thread_pool_size):
     run_integration(reconcile.terraform_resources.run,
                     ctx.obj['dry_run'], print_only,
-                    enable_deletion, io_dir, thread_pool_size)
+                    enable_deletion, io_dir, thread_pool_size,
+                    plugin_cache_dir, working_dir, apply_thread_pool_size)
 
 
 @integration.command()
@@ -284,12 +306,14 @@ def terraform_resources(ctx, print_only, enable_deletion,
 @enable_deletion(default=True)
 @send_mails(default=True)
 @click.pass_context
-def terraform_users(ctx, print_only, enable_deletion, io_dir,
+def terraform_users(ctx, print_only, plugin_cache_dir, working_dir,
+                    apply_thread_pool_size, enable_deletion, io_dir,
                     thread_pool_size, send_mails):
     run_integration(reconcile.terraform_users.run,
                     ctx.obj['dry_run'], print_only,
                     enable_deletion, io_dir,
-                    thread_pool_size, send_mails)
+                    thread_pool_size, send_mails,
+                    plugin_cache_dir, working_dir, apply_thread_pool_size)
 
 
 @integration.command()
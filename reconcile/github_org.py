@@ -1,4 +1,6 @@
+import os
 import logging
+from threading import Lock
 from github import Github
 from github.GithubObject import NotSet
 
@@ -61,43 +63,59 @@ def get_config():
     return config
 
 
-def fetch_current_state(gh_api_store):
+def fetch_org_state(raw_gh_api, org_name, is_managed, managed_teams):
+    org_members = None
+    if is_managed:
+        org_members = raw_gh_api.org_members(org_name)
+        org_members.extend(raw_gh_api.org_invitations(org_name))
+
+    teams = []
+    for team in raw_gh_api.org_teams(org_name):
+        if not is_managed and team['name'] not in managed_teams:
+            continue
+
+        members = raw_gh_api.team_members(team['id'])
+        members.extend(raw_gh_api.team_invitations(team['id']))
+        teams.append({'name': team['name'], 'members': members})
+
+    return {'members': org_members, 'teams': teams}
+
+
+def fetch_current_state(gh_api_store, graphql=False):
     state = AggregatedList()
 
     for org_name in gh_api_store.orgs():
-        g = gh_api_store.github(org_name)
         raw_gh_api = gh_api_store.raw_github_api(org_name)
         managed_teams = gh_api_store.managed_teams(org_name)
         # if 'managedTeams' is not specified
         # we manage all teams
         is_managed = managed_teams is None or len(managed_teams) == 0
 
-        org = g.get_organization(org_name)
-
-        org_members = None
-        if is_managed:
-            org_members = [member.login for member in org.get_members()]
-            org_members.extend(raw_gh_api.org_invitations(org_name))
+        if graphql:
+            org_state = raw_gh_api.org_state(org_name)
+        else:
+            org_state = fetch_org_state(raw_gh_api, org_name,
+                                        is_managed, managed_teams)
 
         all_team_members = []
-        for team in org.get_teams():
-            if not is_managed and team.name not in managed_teams:
+        for team in org_state['teams']:
+            if not is_managed and team['name'] not in managed_teams:
                 continue
 
-            members = [member.login for member in team.get_members()]
-            members.extend(raw_gh_api.team_invitations(team.id))
+            members = team['members']
             all_team_members.extend(members)
 
             state.add(
                 {
                     'service': 'github-org-team',
                     'org': org_name,
-                    'team': team.name
+                    'team': team['name']
                 },
                 members
             )
         all_team_members = list(set(all_team_members))
 
+        org_members = org_state['members'] if is_managed else None
         members = org_members or all_team_members
         state.add(
             {
@@ -148,12 +166,16 @@ def fetch_desired_state():
 class GHApiStore(object):
     _orgs = {}
 
-    def __init__(self, config):
+    def __init__(self, config, cache_dir=None):
         for org_name, org_config in config['github'].items():
             token = org_config['token']
             managed_teams = org_config.get('managed_teams', None)
+            org_cache_dir = None
+            if cache_dir is not None:
+                org_cache_dir = os.path.join(cache_dir, org_name)
+            raw_gh_api = RawGithubApi(token, cache_dir=org_cache_dir)
             self._orgs[org_name] = \
-                (Github(token), RawGithubApi(token), managed_teams)
+                (Github(token), raw_gh_api, managed_teams)
 
     def orgs(self):
         return self._orgs.keys()
@@ -172,6 +194,39 @@ class RunnerAction(object):
     def __init__(self, dry_run, gh_api_store):
         self.dry_run = dry_run
         self.gh_api_store = gh_api_store
+        # organizations, teams and users are looked up once per run
+        # and shared by all actions
+        self._orgs = {}
+        self._teams = {}
+        self._users = {}
+        self._lock = Lock()
+
+    def get_org(self, org):
+        with self._lock:
+            if org not in self._orgs:
+                g = self.gh_api_store.github(org)
+                self._orgs[org] = g.get_organization(org)
+            return self._orgs[org]
+
+    def get_team(self, org, team):
+        gh_org = self.get_org(org)
+        with self._lock:
+            if org not in self._teams:
+                self._teams[org] = {t.name: t for t in gh_org.get_teams()}
+            return self._teams[org][team]
+
+    def add_team(self, org, gh_team):
+        with self._lock:
+            if org in self._teams:
+                self._teams[org][gh_team.name] = gh_team
+
+    def get_user(self, org, member):
+        key = (org, member)
+        with self._lock:
+            if key not in self._users:
+                g = self.gh_api_store.github(org)
+                self._users[key] = g.get_user(member)
+            return self._users[key]
 
     def add_to_team(self):
         label = "add_to_team"
@@ -184,14 +239,11 @@ class RunnerAction(object):
                 for member in items:
                     logging.info([label, member, org, team])
             else:
-                g = self.gh_api_store.github(org)
-                gh_org = g.get_organization(org)
-                teams = {team.name: team.id for team in gh_org.get_teams()}
-                gh_team = gh_org.get_team(teams[team])
+                gh_team = self.get_team(org, team)
 
                 for member in items:
                     logging.info([label, member, org, team])
-                    gh_user = g.get_user(member)
+                    gh_user = self.get_user(org, member)
                     gh_team.add_membership(gh_user, "member")
 
         return action
@@ -207,14 +259,11 @@ class RunnerAction(object):
                 for member in items:
                     logging.info([label, member, org, team])
             else:
-                g = self.gh_api_store.github(org)
-                gh_org = g.get_organization(org)
-                teams = {team.name: team.id for team in gh_org.get_teams()}
-                gh_team = gh_org.get_team(teams[team])
+                gh_team = self.get_team(org, team)
 
                 for member in items:
                     logging.info([label, member, org, team])
-                    gh_user = g.get_user(member)
+                    gh_user = self.get_user(org, member)
                     gh_team.remove_membership(gh_user)
 
         return action
@@ -229,14 +278,15 @@ class RunnerAction(object):
             logging.info([label, org, team])
 
             if not self.dry_run:
-                g = self.gh_api_store.github(org)
-                gh_org = g.get_organization(org)
+                gh_org = self.get_org(org)
 
                 repo_names = NotSet
                 permission = NotSet
                 privacy = "secret"
 
-                gh_org.create_team(team, repo_names, permission, privacy)
+                gh_team = gh_org.create_team(team, repo_names,
+                                             permission, privacy)
+                self.add_team(org, gh_team)
 
         return action
 
@@ -250,12 +300,11 @@ class RunnerAction(object):
                 for member in items:
                     logging.info([label, member, org])
             else:
-                g = self.gh_api_store.github(org)
-                gh_org = g.get_organization(org)
+                gh_org = self.get_org(org)
 
                 for member in items:
                     logging.info([label, member, org])
-                    gh_user = g.get_user(member)
+                    gh_user = self.get_user(org, member)
                     gh_org.add_to_members(gh_user, 'member')
 
         return action
@@ -270,14 +319,13 @@ class RunnerAction(object):
                 for member in items:
                     logging.info([label, member, org])
             else:
-                g = self.gh_api_store.github(org)
-                gh_org = g.get_organization(org)
+                gh_org = self.get_org(org)
 
                 for member in items:
                     logging.info([label, member, org])
 
                     if not self.dry_run:
-                        gh_user = g.get_user(member)
+                        gh_user = self.get_user(org, member)
                         gh_org.remove_from_membership(gh_user)
 
         return action
@@ -293,11 +341,14 @@ def service_is(service):
     return lambda params: params.get("service") == service
 
 
-def run(dry_run=False):
+def run(dry_run=False, cache_dir=None, graphql=False):
     config = get_config()
-    gh_api_store = GHApiStore(config)
+    gh_api_store = GHApiStore(config, cache_dir)
 
-    current_state = fetch_current_state(gh_api_store)
+    current_state = fetch_current_state(gh_api_store, graphql)
+    for org_name in gh_api_store.orgs():
+        metrics = gh_api_store.raw_github_api(org_name).metrics()
+        logging.info(['github_api_metrics', org_name, metrics])
     desired_state = fetch_desired_state()
 
     # Ensure current_state and desired_state match orgs
@@ -223,24 +223,63 @@ def sort_diffs(diff):
         return 2
 
 
-def act(diff, oc_map):
-    cluster = diff['cluster']
-    group = diff['group']
-    user = diff['user']
-    action = diff['action']
+def batch_diffs(diffs):
+    """Group user diffs by (cluster, group, action) so that all the users of
+    a batch are handled with a single oc command. Returns a list of ordered
+    batches per cluster."""
+    batches = {}
+    batches_keys = []
+    for diff in diffs:
+        key = (diff['cluster'], diff['group'], diff['action'])
+        if key not in batches:
+            batches[key] = {
+                "action": diff['action'],
+                "cluster": diff['cluster'],
+                "group": diff['group'],
+                "users": []
+            }
+            batches_keys.append(key)
+        if diff['user'] is not None:
+            batches[key]['users'].append(diff['user'])
+
+    cluster_batches = {}
+    clusters = []
+    for key in batches_keys:
+        cluster = key[0]
+        if cluster not in cluster_batches:
+            cluster_batches[cluster] = []
+            clusters.append(cluster)
+        cluster_batches[cluster].append(batches[key])
+
+    # batches of a cluster are applied in order:
+    # create/remove before add/delete
+    return [sorted(cluster_batches[cluster], key=sort_diffs)
+            for cluster in clusters]
+
+
+def act(batch, oc_map):
+    cluster = batch['cluster']
+    group = batch['group']
+    users = batch['users']
+    action = batch['action']
 
     if action == "create_group":
         oc_map[cluster].create_group(group)
     elif action == "add_user_to_group":
-        oc_map[cluster].add_user_to_group(group, user)
+        oc_map[cluster].add_users_to_group(group, users)
     elif action == "del_user_from_group":
-        oc_map[cluster].del_user_from_group(group, user)
+        oc_map[cluster].del_users_from_group(group, users)
     elif action == "delete_group":
         oc_map[cluster].delete_group(group)
     else:
         raise Exception("invalid action: {}".format(action))
 
 
+def act_on_cluster(batches, oc_map):
+    for batch in batches:
+        act(batch, oc_map)
+
+
 def run(dry_run=False, thread_pool_size=10):
     oc_map, current_state = fetch_current_state(thread_pool_size)
     desired_state = fetch_desired_state()
@@ -252,5 +291,11 @@ def run(dry_run=False, thread_pool_size=10):
     for diff in diffs:
         logging.info(diff.values())
 
-        if not dry_run:
-            act(diff, oc_map)
+    if dry_run:
+        return
+
+    # clusters are independent of each other,
+    # batches within a cluster are applied serially
+    pool = ThreadPool(thread_pool_size)
+    act_on_cluster_partial = partial(act_on_cluster, oc_map=oc_map)
+    pool.map(act_on_cluster_partial, batch_diffs(diffs))
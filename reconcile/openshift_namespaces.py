@@ -1,6 +1,7 @@
 import logging
 from multiprocessing.dummy import Pool as ThreadPool
 from functools import partial
+from threading import BoundedSemaphore
 
 import utils.gql as gql
 import reconcile.openshift_resources as openshift_resources
@@ -35,6 +36,9 @@ QUERY = """
 }
 """
 
+# maximum number of projects created in parallel on a single cluster
+CLUSTER_NEW_PROJECT_LIMIT = 5
+
 
 def get_desired_state():
     gqlapi = gql.get_api()
@@ -53,6 +57,10 @@ def get_desired_state():
     return oc_map, desired_state
 
 
+def fetch_project_names(oc):
+    oc.get_project_names()
+
+
 def check_ns_exists(spec, oc_map):
     cluster = spec['cluster']
     namespace = spec['namespace']
@@ -61,24 +69,34 @@ def check_ns_exists(spec, oc_map):
     return spec, create
 
 
-def create_new_project(spec, oc_map):
+def create_new_project(spec, oc_map, cluster_limits):
     cluster = spec['cluster']
     namespace = spec['namespace']
 
-    oc_map[cluster].new_project(namespace)
+    with cluster_limits[cluster]:
+        oc_map[cluster].new_project(namespace)
 
 
 def run(dry_run=False, thread_pool_size=10):
     oc_map, desired_state = get_desired_state()
+    ocs = [oc for oc in oc_map.values() if oc is not False]
 
+    # list all projects once per cluster, existence checks
+    # are done against the cached project names
     pool = ThreadPool(thread_pool_size)
-    check_ns_exists_partial = \
-        partial(check_ns_exists, oc_map=oc_map)
-    results = pool.map(check_ns_exists_partial, desired_state)
+    pool.map(fetch_project_names, ocs)
+    results = [check_ns_exists(spec, oc_map) for spec in desired_state]
     specs_to_create = [spec for spec, create in results if create]
 
     for spec in specs_to_create:
         logging.info(['create', spec['cluster'], spec['namespace']])
 
-        if not dry_run:
-            create_new_project(spec, oc_map)
+    if dry_run:
+        return
+
+    cluster_limits = {cluster: BoundedSemaphore(CLUSTER_NEW_PROJECT_LIMIT)
+                      for cluster in oc_map}
+    create_new_project_partial = \
+        partial(create_new_project, oc_map=oc_map,
+                cluster_limits=cluster_limits)
+    pool.map(create_new_project_partial, specs_to_create)
@@ -2,6 +2,9 @@ import logging
 import sys
 import copy
 
+from multiprocessing.dummy import Pool as ThreadPool
+from functools import partial
+
 import utils.gql as gql
 import utils.vault_client as vault_client
 
@@ -117,48 +120,71 @@ class ClusterStore(object):
             api.cleanup()
 
 
-def fetch_current_state(cluster_store):
+def fetch_namespace_rolebindings(spec, cluster_store):
+    cluster = spec['cluster']
+    namespace = spec['namespace']
+    api = cluster_store.api(cluster)
+
+    # a single request for all the rolebindings in the namespace,
+    # they are split by role locally
+    rolebindings = {}
+    for rolebinding in api.get_rolebindings(namespace):
+        role = rolebinding[u'roleRef'][u'name']
+        rolebindings.setdefault(role, []).append(rolebinding)
+
+    return cluster, namespace, rolebindings
+
+
+def fetch_current_state(cluster_store, thread_pool_size):
     state = AggregatedList()
 
-    for cluster in cluster_store.clusters():
-        api = cluster_store.api(cluster)
-
-        for namespace in cluster_store.namespaces(cluster):
-            roles = cluster_store.namespace_managed_roles(cluster, namespace)
-
-            for role in roles:
-                rolebindings = api.get_rolebindings(namespace, role)
-
-                users = [
-                    subject[u'name']
-                    for rolebinding in rolebindings
-                    for subject in rolebinding['subjects']
-                    if subject[u'kind'] == u'User'
-                ]
-
-                state.add({
-                    "service": "openshift-rolebinding",
-                    "cluster": cluster,
-                    "namespace": namespace,
-                    "role": role,
-                    "kind": u'User',
-                }, users)
-
-                bots = [
-                    subject[u'namespace'] + '/' + subject[u'name']
-                    for rolebinding in rolebindings
-                    for subject in rolebinding['subjects']
-                    if subject[u'kind'] == u'ServiceAccount' and
-                    u'namespace' in subject
-                ]
-
-                state.add({
-                    "service": "openshift-rolebinding",
-                    "cluster": cluster,
-                    "namespace": namespace,
-                    "role": role,
-                    "kind": u'ServiceAccount'
-                }, bots)
+    specs = [
+        {"cluster": cluster, "namespace": namespace}
+        for cluster in cluster_store.clusters()
+        for namespace in cluster_store.namespaces(cluster)
+    ]
+
+    pool = ThreadPool(thread_pool_size)
+    fetch_namespace_rolebindings_partial = \
+        partial(fetch_namespace_rolebindings, cluster_store=cluster_store)
+    results = pool.map(fetch_namespace_rolebindings_partial, specs)
+
+    for cluster, namespace, namespace_rolebindings in results:
+        roles = cluster_store.namespace_managed_roles(cluster, namespace)
+
+        for role in roles:
+            rolebindings = namespace_rolebindings.get(role, [])
+
+            users = [
+                subject[u'name']
+                for rolebinding in rolebindings
+                for subject in rolebinding['subjects']
+                if subject[u'kind'] == u'User'
+            ]
+
+            state.add({
+                "service": "openshift-rolebinding",
+                "cluster": cluster,
+                "namespace": namespace,
+                "role": role,
+                "kind": u'User',
+            }, users)
+
+            bots = [
+                subject[u'namespace'] + '/' + subject[u'name']
+                for rolebinding in rolebindings
+                for subject in rolebinding['subjects']
+                if subject[u'kind'] == u'ServiceAccount' and
+                u'namespace' in subject
+            ]
+
+            state.add({
+                "service": "openshift-rolebinding",
+                "cluster": cluster,
+                "namespace": namespace,
+                "role": role,
+                "kind": u'ServiceAccount'
+            }, bots)
 
     return state
 
@@ -251,7 +277,7 @@ class RunnerAction(object):
         return self.manage_role('del_role', 'remove_role_from_user')
 
 
-def run(dry_run=False):
+def run(dry_run=False, thread_pool_size=10):
     gqlapi = gql.get_api()
 
     namespaces = gqlapi.query(NAMESPACES_QUERY)['namespaces']
@@ -259,7 +285,7 @@ def run(dry_run=False):
 
     cluster_store = ClusterStore(namespaces)
 
-    current_state = fetch_current_state(cluster_store)
+    current_state = fetch_current_state(cluster_store, thread_pool_size)
     desired_state = fetch_desired_state(roles)
 
     # calculate diff
@@ -108,26 +108,34 @@ def fetch_current_state(tf_query, thread_pool_size):
     return ri, oc_map
 
 
-def setup(print_only, thread_pool_size):
+def setup(print_only, thread_pool_size, plugin_cache_dir=None,
+          working_dir=None, apply_thread_pool_size=5):
     tf_query = get_tf_query()
     ri, oc_map = fetch_current_state(tf_query, thread_pool_size)
     ts = Terrascript(QONTRACT_INTEGRATION,
                      QONTRACT_TF_PREFIX,
                      thread_pool_size,
-                     oc_map)
+                     oc_map,
+                     working_dir=working_dir,
+                     ri=ri)
     working_dirs, error = ts.dump(print_only)
+    # persistent working directories are kept between runs
+    tmp_dirs = working_dirs if working_dir is None else {}
     if error:
-        cleanup_and_exit(status=error, working_dirs=working_dirs)
+        cleanup_and_exit(status=error, working_dirs=tmp_dirs)
     tf = Terraform(QONTRACT_INTEGRATION,
                    QONTRACT_INTEGRATION_VERSION,
                    QONTRACT_TF_PREFIX,
                    working_dirs,
-                   thread_pool_size)
+                   thread_pool_size,
+                   plugin_cache_dir=plugin_cache_dir,
+                   keep_working_dirs=working_dir is not None,
+                   apply_thread_pool_size=apply_thread_pool_size)
     existing_secrets = tf.get_terraform_output_secrets()
     ts.populate_resources(tf_query, existing_secrets)
     _, error = ts.dump(print_only, existing_dirs=working_dirs)
     if error:
-        cleanup_and_exit(status=error, working_dirs=working_dirs)
+        cleanup_and_exit(status=error, working_dirs=tmp_dirs)
 
     return ri, oc_map, tf
 
@@ -143,8 +151,11 @@ def cleanup_and_exit(tf=None, status=False, working_dirs={}):
 
 def run(dry_run=False, print_only=False,
         enable_deletion=False, io_dir='throughput/',
-        thread_pool_size=10):
-    ri, oc_map, tf = setup(print_only, thread_pool_size)
+        thread_pool_size=10, plugin_cache_dir=None, working_dir=None,
+        apply_thread_pool_size=5):
+    ri, oc_map, tf = setup(print_only, thread_pool_size,
+                           plugin_cache_dir, working_dir,
+                           apply_thread_pool_size)
     if print_only:
         cleanup_and_exit()
     if tf is None:
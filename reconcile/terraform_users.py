@@ -48,11 +48,12 @@ def get_tf_query():
     return adjust_tf_query(tf_query)
 
 
-def setup(print_only, thread_pool_size):
+def setup(print_only, thread_pool_size, working_dir=None):
     tf_query = get_tf_query()
     ts = Terrascript(QONTRACT_INTEGRATION,
                      QONTRACT_TF_PREFIX,
-                     thread_pool_size)
+                     thread_pool_size,
+                     working_dir=working_dir)
     err = ts.populate_users(tf_query)
     if err:
         return None, err
@@ -99,8 +100,10 @@ def cleanup_and_exit(tf=None, status=False):
 
 def run(dry_run=False, print_only=False,
         enable_deletion=False, io_dir='throughput/',
-        thread_pool_size=10, send_mails=True):
-    working_dirs, err = setup(print_only, thread_pool_size)
+        thread_pool_size=10, send_mails=True,
+        plugin_cache_dir=None, working_dir=None,
+        apply_thread_pool_size=5):
+    working_dirs, err = setup(print_only, thread_pool_size, working_dir)
     if err:
         cleanup_and_exit(status=err)
     if print_only:
@@ -111,7 +114,10 @@ def run(dry_run=False, print_only=False,
                    QONTRACT_TF_PREFIX,
                    working_dirs,
                    thread_pool_size,
-                   init_users=True)
+                   init_users=True,
+                   plugin_cache_dir=plugin_cache_dir,
+                   keep_working_dirs=working_dir is not None,
+                   apply_thread_pool_size=apply_thread_pool_size)
     if tf is None:
         err = True
         cleanup_and_exit(tf, err)
@@ -0,0 +1,251 @@
+
+import boto3
+import pytest
+
+from botocore.stub import Stubber
+from mock import patch, MagicMock
+from multiprocessing.dummy import Pool as ThreadPool
+
+from utils.aws_api import AWSApi
+
+
+def aws_api(account, users):
+    with patch('utils.aws_api.get_config') as m_get_config:
+        m_get_config.return_value = {'terraform': {}}
+        aws = AWSApi(1)
+    aws.users = {account: set(users)}
+    aws.owner_indexes = {}
+    aws.init_owner_index(account)
+    aws.tags = {account: {}}
+    aws.resources = {account: {}}
+    return aws
+
+
+def aws_client(service):
+    return boto3.client(service,
+                        region_name='us-east-1',
+                        aws_access_key_id='access_key',
+                        aws_secret_access_key='secret_key')
+
+
+def tag_mapping(arn, key, value):
+    return {'ResourceARN': arn, 'Tags': [{'Key': key, 'Value': value}]}
+
+
+TAG_PAGES = [
+    [
+        tag_mapping('arn:aws:s3:::tagged-bucket', 'owner', 'app-sre'),
+        tag_mapping('arn:aws:sqs:us-east-1:123456789012:tagged-queue',
+                    'ENV', 'prod'),
+    ],
+    [
+        tag_mapping('arn:aws:dynamodb:us-east-1:123456789012:'
+                    'table/tagged-table', 'aws_gc_hands_off', 'true'),
+        tag_mapping('arn:aws:rds:us-east-1:123456789012:db:tagged-db',
+                    'managed_by_integration', 'terraform_resources'),
+        tag_mapping('arn:aws:rds:us-east-1:123456789012:'
+                    'snapshot:tagged-snapshot', 'environment', 'stage'),
+        # same names as other resource types, with harmless tags
+        tag_mapping('arn:aws:rds:us-east-1:123456789012:db:tagged-snapshot',
+                    'team', 'other'),
+        tag_mapping('arn:aws:dynamodb:us-east-1:123456789012:'
+                    'table/tagged-db', 'team', 'other'),
+    ],
+]
+
+
+def stub_tables(stubber, tables, page_size):
+    for i in range(0, len(tables), page_size):
+        page = tables[i:i + page_size]
+        response = {'TableNames': page}
+        expected_params = {}
+        if i:
+            expected_params['ExclusiveStartTableName'] = tables[i - 1]
+        if i + page_size < len(tables):
+            response['LastEvaluatedTableName'] = page[-1]
+        stubber.add_response('list_tables', response, expected_params)
+
+
+class TestAWSApi(object):
+    def test_paginate_returns_all_pages(self):
+        tables = ['table-{:05d}'.format(i) for i in range(5000)]
+        client = aws_client('dynamodb')
+
+        with Stubber(client) as stubber:
+            stub_tables(stubber, tables, 100)
+            items = AWSApi.paginate(client, 'list_tables', 'TableNames')
+
+            assert list(items) == tables
+            stubber.assert_no_pending_responses()
+
+    def test_map_dynamodb_resources_maps_all_pages(self):
+        owned = ['owner-{:05d}'.format(i) for i in range(2500)]
+        not_owned = ['table-{:05d}'.format(i) for i in range(2500)]
+        client = aws_client('dynamodb')
+        aws = aws_api('account', ['owner'])
+
+        with Stubber(client) as stubber:
+            stub_tables(stubber, owned + not_owned, 100)
+            with patch.object(AWSApi, 'get_client') as m_get_client:
+                m_get_client.return_value = client
+                aws.map_dynamodb_resources('account')
+
+            assert aws.resources['account']['dynamodb_no_owner'] == \
+                not_owned
+            stubber.assert_no_pending_responses()
+
+    def test_has_owner(self):
+        aws = aws_api('account', ['User1', 'user12', 'other'])
+
+        assert aws.has_owner('account', 'user1-bucket') is True
+        assert aws.has_owner('account', 'USER12-queue') is True
+        assert aws.has_owner('account', 'use-table') is False
+        assert aws.has_owner(
+            'account', 'https://sqs.amazonaws.com/123/other-queue') is True
+        assert aws.has_owner(
+            'account', 'https://sqs.amazonaws.com/123/Other-queue') is False
+
+    def test_resources_without_owner_with_many_users(self):
+        users = ['owner-{:05d}'.format(i) for i in range(5000)]
+        owned = ['owner-{:05d}-bucket'.format(i) for i in range(5000)]
+        not_owned = ['owner-{:05d}-bucket'.format(i)
+                     for i in range(5000, 10000)] + \
+            ['bucket-{:05d}'.format(i) for i in range(10000)]
+        aws = aws_api('account', users)
+
+        with patch.object(AWSApi, 'has_prefix',
+                          wraps=AWSApi.has_prefix) as m_has_prefix:
+            without_owner = list(aws.get_resources_without_owner(
+                'account', owned + not_owned))
+
+            assert without_owner == not_owned
+            # a single prefix tree lookup per resource,
+            # independent of the number of users
+            assert m_has_prefix.call_count == len(owned + not_owned)
+
+    def test_delete_keys_only_lists_accounts_with_keys(self):
+        aws = aws_api('account', ['user1', 'user2'])
+        aws.users['other'] = set(['user3'])
+        iam = MagicMock()
+        iam.can_paginate.return_value = False
+        iam.list_access_keys.side_effect = lambda UserName: {
+            'AccessKeyMetadata': [{'AccessKeyId': UserName + '-key'}]}
+        aws.credentials = {'account': {}, 'other': {}}
+
+        with patch.object(AWSApi, 'get_client') as m_get_client:
+            m_get_client.return_value = iam
+            aws.delete_keys(False,
+                            {'account': ['user2-key', 'missing-key']})
+
+        assert iam.list_access_keys.call_count == 2
+        iam.delete_access_key.assert_called_once_with(
+            UserName='user2', AccessKeyId='user2-key')
+
+    def test_delete_bucket_deletes_all_versions_in_batches(self):
+        aws = aws_api('account', [])
+        s3 = MagicMock()
+        pages = []
+        for p in range(5):
+            versions = [{'Key': 'key-{}-{}'.format(p, i), 'VersionId': 'v1'}
+                        for i in range(500)]
+            markers = [{'Key': 'key-{}-{}'.format(p, i), 'VersionId': 'v2'}
+                       for i in range(100)]
+            pages.append({'Versions': versions, 'DeleteMarkers': markers})
+        s3.get_paginator.return_value.paginate.return_value = pages
+        s3.delete_objects.return_value = {}
+
+        aws.delete_bucket(s3, 'bucket')
+
+        batches = [c[1]['Delete']['Objects']
+                   for c in s3.delete_objects.call_args_list]
+        assert sorted(len(b) for b in batches) == [1000, 1000, 1000]
+        assert len(set((o['Key'], o['VersionId'])
+                       for b in batches for o in b)) == 3000
+        s3.delete_bucket.assert_called_once_with(Bucket='bucket')
+
+    def test_delete_bucket_keeps_bucket_on_errors(self):
+        aws = aws_api('account', [])
+        s3 = MagicMock()
+        s3.get_paginator.return_value.paginate.return_value = [
+            {'Versions': [{'Key': 'key', 'VersionId': 'v1'}]}]
+        s3.delete_objects.return_value = {'Errors': [
+            {'Key': 'key', 'VersionId': 'v1', 'Message': 'Access Denied'}]}
+
+        with pytest.raises(Exception):
+            aws.delete_bucket(s3, 'bucket')
+        s3.delete_bucket.assert_not_called()
+
+    def test_clients_are_cached_per_thread(self):
+        aws = aws_api('account', [])
+        aws.credentials = {'account': {
+            'aws_access_key_id': 'access_key',
+            'aws_secret_access_key': 'secret_key',
+            'region_name': 'us-east-1'}}
+
+        client = aws.get_client('account', 'sqs')
+        assert aws.get_client('account', 'sqs') is client
+        assert aws.get_client('account', 'sqs', 'eu-west-1') is not client
+
+        pool = ThreadPool(1)
+        [thread_client] = pool.map(
+            lambda _: aws.get_client('account', 'sqs'), [None])
+        assert thread_client is not client
+
+    def test_tag_index_filters_every_resource_type(self):
+        aws = aws_api('account', [])
+        tagging = aws_client('resourcegroupstaggingapi')
+        s3 = aws_client('s3')
+
+        with Stubber(tagging) as stubber:
+            stubber.add_response(
+                'get_resources',
+                {'ResourceTagMappingList': TAG_PAGES[0],
+                 'PaginationToken': 'token'},
+                {'ResourceTypeFilters': AWSApi.TAGGED_TYPES})
+            stubber.add_response(
+                'get_resources',
+                {'ResourceTagMappingList': TAG_PAGES[1],
+                 'PaginationToken': ''},
+                {'ResourceTypeFilters': AWSApi.TAGGED_TYPES,
+                 'PaginationToken': 'token'})
+            with patch.object(AWSApi, 'get_client') as m_get_client:
+                m_get_client.return_value = tagging
+                aws.map_tags('account')
+            stubber.assert_no_pending_responses()
+
+        assert aws.get_resource_tags('account', 'dynamodb',
+                                     'table/tagged-table') == \
+            [{'Key': 'aws_gc_hands_off', 'Value': 'true'}]
+        assert aws.get_resource_tags('account', 'sqs', 'other-queue') == []
+        assert aws.get_resource_tags('account', 's3', 'other-bucket') is None
+
+        queue_url = 'https://sqs.us-east-1.amazonaws.com/123456789012/{}'
+        assert aws.custom_sqs_filter(
+            'account',
+            [queue_url.format('tagged-queue'),
+             queue_url.format('untagged-queue')]) == \
+            [queue_url.format('untagged-queue')]
+        assert aws.custom_dynamodb_filter(
+            'account', ['tagged-table', 'tagged-db']) == ['tagged-db']
+        assert aws.custom_rds_filter(
+            'account', ['tagged-db', 'tagged-snapshot']) == \
+            ['tagged-snapshot']
+        assert aws.custom_rds_snapshot_filter(
+            'account', ['tagged-snapshot', 'tagged-db']) == ['tagged-db']
+
+        # buckets that are not in the index may be in another region
+        # and have their tags read directly
+        with Stubber(s3) as stubber:
+            stubber.add_response(
+                'get_bucket_tagging',
+                {'TagSet': [{'Key': 'owner', 'Value': 'app-sre'}]},
+                {'Bucket': 'other-region-bucket'})
+            stubber.add_client_error(
+                'get_bucket_tagging', 'NoSuchTagSet',
+                expected_params={'Bucket': 'untagged-bucket'})
+
+            assert aws.custom_s3_filter(
+                'account', s3,
+                ['tagged-bucket', 'other-region-bucket',
+                 'untagged-bucket']) == ['untagged-bucket']
+            stubber.assert_no_pending_responses()
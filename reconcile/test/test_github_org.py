@@ -1,4 +1,4 @@
-from mock import patch
+from mock import patch, MagicMock
 from .fixtures import Fixtures
 
 import utils.config as config
@@ -10,6 +10,30 @@ fxt = Fixtures('github_org')
 
 
 class RawGithubApiMock(object):
+    def __init__(self, spec):
+        self.spec = spec
+
+    def org_members(self, org_name):
+        return [m['login'] for m in self.spec[org_name]['members']]
+
+    def org_teams(self, org_name):
+        return [{'id': t['name'], 'name': t['name']}
+                for t in self.spec[org_name]['teams']]
+
+    def team_members(self, team_id):
+        for org in self.spec.values():
+            for team in org['teams']:
+                if team['name'] == team_id:
+                    return [m['login'] for m in team['members']]
+
+    def org_state(self, org_name):
+        teams = [{'name': t['name'], 'members': self.team_members(t['id'])}
+                 for t in self.org_teams(org_name)]
+        return {'members': self.org_members(org_name), 'teams': teams}
+
+    def metrics(self):
+        return {}
+
     def org_invitations(self, org_name):
         return []
 
@@ -74,16 +98,17 @@ class TestGithubOrg(object):
         config.init_from_toml(fxt.path('config.toml'))
         gql.init_from_config()
 
-    def do_current_state_test(self, path):
+    def do_current_state_test(self, path, graphql=False):
         fixture = fxt.get_anymarkup(path)
 
         with patch('reconcile.github_org.RawGithubApi') as m_rga:
             with patch('reconcile.github_org.Github') as m_gh:
                 m_gh.return_value = GithubMock(fixture['gh_api'])
-                m_rga.return_value = RawGithubApiMock()
+                m_rga.return_value = RawGithubApiMock(fixture['gh_api'])
 
                 gh_api_store = github_org.GHApiStore(config.get_config())
-                current_state = github_org.fetch_current_state(gh_api_store)
+                current_state = github_org.fetch_current_state(gh_api_store,
+                                                               graphql)
                 current_state = current_state.dump()
 
                 expected_current_state = fixture['state']
@@ -119,5 +144,29 @@ class TestGithubOrg(object):
     def test_current_state_simple(self):
         self.do_current_state_test('current_state_simple.yml')
 
+    def test_current_state_simple_graphql(self):
+        self.do_current_state_test('current_state_simple.yml', graphql=True)
+
     def test_desired_state_simple(self):
         self.do_desired_state_test('desired_state_simple.yml')
+
+    def test_runner_action_reuses_lookups(self):
+        g = MagicMock()
+        team = MagicMock()
+        team.name = 'team1'
+        g.get_organization.return_value.get_teams.return_value = [team]
+        gh_api_store = MagicMock()
+        gh_api_store.github.return_value = g
+
+        runner_action = github_org.RunnerAction(False, gh_api_store)
+        add_to_team = runner_action.add_to_team()
+        params = {'org': 'org_a', 'team': 'team1'}
+        add_to_team(params, ['user1', 'user2'])
+        add_to_team(params, ['user1'])
+        runner_action.del_from_team()(params, ['user2'])
+
+        assert g.get_organization.call_count == 1
+        assert g.get_organization.return_value.get_teams.call_count == 1
+        assert g.get_user.call_count == 2
+        assert team.add_membership.call_count == 3
+        assert team.remove_membership.call_count == 1
@@ -0,0 +1,82 @@
+import pytest
+
+from mock import patch
+
+from utils.oc import OC, StatusCodeError
+
+
+def projects(*names):
+    return {'items': [{'metadata': {'name': n}} for n in names]}
+
+
+def status_code_error(message):
+    e = StatusCodeError(message)
+    e.message = message
+    return e
+
+
+class TestOC(object):
+    def test_project_names_are_listed_once(self):
+        oc = OC('server', 'token')
+
+        with patch.object(OC, 'get_all') as m_get_all, \
+                patch.object(OC, 'get') as m_get:
+            m_get_all.return_value = projects('ns1', 'ns2')
+            m_get.side_effect = status_code_error('NotFound')
+
+            assert oc.project_exists('ns1') is True
+            assert oc.project_exists('ns2') is True
+            assert oc.project_exists('ns3') is False
+            assert m_get_all.call_count == 1
+            assert m_get.call_count == 1
+
+    def test_project_missing_from_listing(self):
+        oc = OC('server', 'token')
+
+        with patch.object(OC, 'get_all') as m_get_all, \
+                patch.object(OC, 'get') as m_get:
+            m_get_all.return_value = projects()
+
+            assert oc.project_exists('hidden') is True
+            assert oc.project_exists('hidden') is True
+            assert m_get.call_count == 1
+
+            m_get.side_effect = status_code_error('Forbidden')
+            with pytest.raises(StatusCodeError):
+                oc.project_exists('forbidden')
+
+    def test_project_cache_follows_mutations(self):
+        oc = OC('server', 'token')
+
+        with patch.object(OC, 'get_all') as m_get_all, \
+                patch.object(OC, 'get') as m_get, \
+                patch.object(OC, '_run') as m_run:
+            m_get_all.return_value = projects('ns1')
+            m_get.side_effect = status_code_error('NotFound')
+            assert oc.get_project_names() == set(['ns1'])
+
+            oc.new_project('ns2')
+            assert oc.project_exists('ns2') is True
+
+            oc.delete_project('ns1')
+            assert oc.project_exists('ns1') is False
+
+            assert m_get_all.call_count == 1
+            assert m_run.call_count == 2
+
+    def test_get_items_skips_missing_namespace(self):
+        oc = OC('server', 'token')
+
+        with patch.object(OC, 'get_all') as m_get_all, \
+                patch.object(OC, 'get') as m_get, \
+                patch.object(OC, '_run_json') as m_run_json:
+            m_get_all.return_value = projects('ns1')
+            m_get.side_effect = status_code_error('NotFound')
+            m_run_json.return_value = {'items': []}
+
+            assert oc.get_items('Secret', namespace='missing') == []
+            oc.get_items('Secret', namespace='ns1')
+            oc.get_items('ConfigMap', namespace='ns1')
+
+            assert m_get_all.call_count == 1
+            assert m_run_json.call_count == 2
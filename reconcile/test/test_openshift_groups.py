@@ -0,0 +1,50 @@
+import reconcile.openshift_groups as openshift_groups
+
+
+def diff(action, cluster, group, user=None):
+    return {
+        "action": action,
+        "cluster": cluster,
+        "group": group,
+        "user": user
+    }
+
+
+class TestOpenshiftGroups(object):
+    def test_batch_diffs_groups_users(self):
+        diffs = [
+            diff("add_user_to_group", "c1", "g1", "u1"),
+            diff("add_user_to_group", "c1", "g1", "u2"),
+            diff("add_user_to_group", "c2", "g1", "u3"),
+            diff("del_user_from_group", "c1", "g1", "u4"),
+        ]
+
+        batches = openshift_groups.batch_diffs(diffs)
+
+        assert len(batches) == 2
+        c1, c2 = batches
+        assert [(b['action'], b['users']) for b in c1] == [
+            ("del_user_from_group", ["u4"]),
+            ("add_user_to_group", ["u1", "u2"]),
+        ]
+        assert [(b['action'], b['users']) for b in c2] == [
+            ("add_user_to_group", ["u3"]),
+        ]
+
+    def test_batch_diffs_keeps_group_ordering(self):
+        diffs = [
+            diff("delete_group", "c1", "g2"),
+            diff("add_user_to_group", "c1", "g1", "u1"),
+            diff("del_user_from_group", "c1", "g2", "u2"),
+            diff("create_group", "c1", "g1"),
+        ]
+
+        [batches] = openshift_groups.batch_diffs(diffs)
+        actions = [b['action'] for b in batches]
+
+        assert actions.index("create_group") < \
+            actions.index("add_user_to_group")
+        assert actions.index("del_user_from_group") < \
+            actions.index("delete_group")
+        assert [b['users'] for b in batches
+                if b['action'] == "create_group"] == [[]]
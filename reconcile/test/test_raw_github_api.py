@@ -0,0 +1,155 @@
+import json
+import threading
+
+from mock import patch, MagicMock
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from utils.raw_github_api import RawGithubApi
+
+
+def response(status_code, body=None, etag=None, links={}, remaining=5000):
+    res = MagicMock()
+    res.status_code = status_code
+    res.json.return_value = body
+    res.links = links
+    res.headers = {'X-RateLimit-Limit': '5000',
+                   'X-RateLimit-Remaining': str(remaining)}
+    if etag is not None:
+        res.headers['ETag'] = etag
+    return res
+
+
+def connection(items, after, page_size):
+    start = int(after or 0)
+    end = start + page_size
+    return {
+        'nodes': items[start:end],
+        'pageInfo': {'hasNextPage': end < len(items),
+                     'endCursor': str(end)}
+    }
+
+
+# an org with 150 members and 60 teams, the first team
+# has all 150 members, every other team a single one
+MEMBERS = [{'login': 'user{}'.format(i)} for i in range(150)]
+TEAMS = [{'databaseId': i,
+          'name': 'team{}'.format(i),
+          'slug': 'team{}'.format(i),
+          'members': MEMBERS if i == 0 else MEMBERS[i:i + 1]}
+         for i in range(60)]
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    """Fake GitHub API serving the REST and GraphQL requests of org_state"""
+    members = MEMBERS
+    teams = TEAMS
+    rest = {
+        '/orgs/org/invitations': [
+            {'id': 1, 'login': 'invited', 'team_count': 1},
+            {'id': 2, 'login': None, 'team_count': 1},
+            {'id': 3, 'login': 'org-only', 'team_count': 0},
+        ],
+        '/orgs/org/invitations/1/teams': [{'id': 1}],
+    }
+    graphql_requests = 0
+
+    def do_GET(self):
+        self.respond(self.rest[self.path])
+
+    def do_POST(self):
+        FakeGithubHandler.graphql_requests += 1
+        length = int(self.headers['Content-Length'])
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        query = body['query']
+        after = body['variables']['after']
+
+        if 'membersWithRole' in query:
+            org = {'membersWithRole': connection(self.members, after, 100)}
+        elif 'team(slug' in query:
+            team = [t for t in self.teams
+                    if t['slug'] == body['variables']['slug']][0]
+            org = {'team': {
+                'members': connection(team['members'], after, 100)}}
+        else:
+            teams = connection(self.teams, after, 50)
+            teams['nodes'] = [
+                dict(t, members=connection(t['members'], None, 100))
+                for t in teams['nodes']]
+            org = {'teams': teams}
+        self.respond({'data': {'organization': org}})
+
+    def respond(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRawGithubApi(object):
+    def test_query_revalidates_cached_pages(self, tmpdir):
+        next_link = {'next': {'url': 'https://api.github.com/page2'}}
+
+        with patch('utils.raw_github_api.requests.get') as m_get:
+            m_get.side_effect = [
+                response(200, [{'login': 'user1'}], 'etag1', next_link),
+                response(200, [{'login': 'user2'}], 'etag2', remaining=4998),
+            ]
+            api = RawGithubApi('token', cache_dir=str(tmpdir))
+            assert api.org_members('org') == ['user1', 'user2']
+
+        with patch('utils.raw_github_api.requests.get') as m_get:
+            m_get.side_effect = [response(304), response(304)]
+            api = RawGithubApi('token', cache_dir=str(tmpdir))
+            assert api.org_members('org') == ['user1', 'user2']
+
+            etags = [c[1]['headers']['If-None-Match']
+                     for c in m_get.call_args_list]
+            assert etags == ['etag1', 'etag2']
+            assert api.metrics() == {'requests': 2,
+                                     'not_modified': 2,
+                                     'rate_limit_limit': 5000,
+                                     'rate_limit_remaining': 5000}
+
+    def test_query_without_cache_dir(self):
+        with patch('utils.raw_github_api.requests.get') as m_get:
+            m_get.return_value = response(200, [], 'etag')
+            api = RawGithubApi('token')
+            api.org_members('org')
+            api.org_members('org')
+
+            for c in m_get.call_args_list:
+                assert 'If-None-Match' not in c[1]['headers']
+
+    def test_org_state_from_graphql(self):
+        server = HTTPServer(('127.0.0.1', 0), FakeGithubHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            api = RawGithubApi('token')
+            api.BASE_URL = 'http://127.0.0.1:{}'.format(server.server_port)
+            api.GRAPHQL_URL = api.BASE_URL + '/graphql'
+
+            org_state = api.org_state('org')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        all_users = ['user{}'.format(i) for i in range(150)]
+        assert org_state['members'] == all_users + ['invited', 'org-only']
+        teams = {t['name']: t['members'] for t in org_state['teams']}
+        assert len(teams) == 60
+        assert teams['team0'] == all_users
+        assert teams['team1'] == ['user1', 'invited']
+        assert teams['team59'] == ['user59']
+        # 2 pages of members, 2 pages of teams, 1 more page of team0
+        assert FakeGithubHandler.graphql_requests == 5
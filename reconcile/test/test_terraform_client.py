@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from utils.terraform_client import TerraformClient
+
+
+class TerraformMock(object):
+    def __init__(self, working_dir, serial=1):
+        self.working_dir = working_dir
+        self.serial = serial
+
+        self.apply_return_code = 0
+        self.applied = False
+
+    def cmd(self, cmd, *args, **kwargs):
+        state = {'serial': self.serial, 'lineage': 'lineage'}
+        return 0, json.dumps(state), ''
+
+    def plan(self, *args, **kwargs):
+        return 0, '', ''
+
+    def apply(self, *args, **kwargs):
+        self.applied = True
+        return self.apply_return_code, '', ''
+
+
+class TestTerraformClient(object):
+    def setup_method(self, method):
+        self.wd = tempfile.mkdtemp()
+        with open(os.path.join(self.wd, 'config.tf'), 'w') as f:
+            f.write('{"resource": {}}')
+        self.tf_client = TerraformClient('integration', '0.1.0', 'qrtf',
+                                         {}, 1, keep_working_dirs=True)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.wd)
+
+    def test_is_unchanged_after_apply(self):
+        tf = TerraformMock(self.wd)
+        assert self.tf_client.is_unchanged(tf) is False
+
+        self.tf_client.write_plan_state(tf)
+        assert self.tf_client.is_unchanged(tf) is True
+
+    def test_state_serial_change(self):
+        self.tf_client.write_plan_state(TerraformMock(self.wd))
+
+        assert self.tf_client.is_unchanged(
+            TerraformMock(self.wd, serial=2)) is False
+
+    def test_config_change(self):
+        tf = TerraformMock(self.wd)
+        self.tf_client.write_plan_state(tf)
+
+        with open(os.path.join(self.wd, 'config.tf'), 'w') as f:
+            f.write('{"resource": {"changed": {}}}')
+        assert self.tf_client.is_unchanged(tf) is False
+
+    def test_full_plan_interval(self):
+        tf = TerraformMock(self.wd)
+        self.tf_client.write_plan_state(tf)
+
+        self.tf_client.FULL_PLAN_INTERVAL = -1
+        assert self.tf_client.is_unchanged(tf) is False
+
+    def test_temporary_working_dirs(self):
+        tf_client = TerraformClient('integration', '0.1.0', 'qrtf', {}, 1)
+        tf = TerraformMock(self.wd)
+
+        tf_client.write_plan_state(tf)
+        assert tf_client.is_unchanged(tf) is False
+
+
+PLAN_TEXT = """
+  + aws_iam_user.new
+      id: <computed>
+  ~ aws_s3_bucket.changed
+  - aws_iam_user.old
+-/+ aws_db_instance.db (new resource required)
+"""
+
+PLAN_JSON = {
+    'resource_changes': [
+        {'mode': 'managed', 'type': 'aws_iam_user', 'name': 'new',
+         'change': {'actions': ['create']}},
+        {'mode': 'managed', 'type': 'aws_s3_bucket', 'name': 'changed',
+         'change': {'actions': ['update']}},
+        {'mode': 'managed', 'type': 'aws_iam_user', 'name': 'old',
+         'change': {'actions': ['delete']}},
+        {'mode': 'managed', 'type': 'aws_db_instance', 'name': 'db',
+         'change': {'actions': ['delete', 'create']}},
+        {'mode': 'managed', 'type': 'aws_iam_user', 'name': 'same',
+         'change': {'actions': ['no-op']}},
+        {'mode': 'data', 'type': 'aws_iam_policy', 'name': 'policy',
+         'change': {'actions': ['read']}},
+    ]
+}
+
+PLAN_CHANGES = [
+    ('create', 'aws_iam_user', 'new'),
+    ('update', 'aws_s3_bucket', 'changed'),
+    ('destroy', 'aws_iam_user', 'old'),
+    ('replace', 'aws_db_instance', 'db'),
+]
+
+
+class TestTerraformClientPlan(object):
+    def setup_method(self, method):
+        self.tf_client = TerraformClient('integration', '0.1.0', 'qrtf',
+                                         {}, 1)
+
+    def test_parse_plan_text(self):
+        changes = TerraformClient.parse_plan_text(PLAN_TEXT)
+        assert sorted(changes) == sorted(PLAN_CHANGES)
+
+    def test_parse_plan_json(self):
+        changes = TerraformClient.parse_plan_json(PLAN_JSON)
+        assert sorted(changes) == sorted(PLAN_CHANGES)
+
+    def test_terraform_version(self):
+        with patch('utils.terraform_client.subprocess.check_output') as m:
+            m.return_value = 'Terraform v0.11.14\n'
+            assert TerraformClient.terraform_version() == (0, 11)
+
+            m.side_effect = OSError
+            assert TerraformClient.terraform_version() is None
+
+    def test_plan_changes_without_show_json(self):
+        self.tf_client.show_json = False
+        with patch.object(TerraformClient, 'show_plan_json') as m_show:
+            changes = self.tf_client.plan_changes(None, PLAN_TEXT, False)
+
+            assert sorted(changes) == sorted(PLAN_CHANGES)
+            assert m_show.call_count == 0
+
+    def test_plan_changes_with_show_json(self):
+        self.tf_client.show_json = True
+        with patch.object(TerraformClient, 'show_plan_json') as m_show:
+            m_show.return_value = PLAN_JSON
+            changes = self.tf_client.plan_changes(None, '', False)
+
+            assert sorted(changes) == sorted(PLAN_CHANGES)
+            assert m_show.call_count == 1
+
+    def test_log_plan_diff_enable_deletion(self):
+        deletions_detected, deleted_users = self.tf_client.log_plan_diff(
+            'account', iter(PLAN_CHANGES), True)
+
+        assert deletions_detected is True
+        assert deleted_users == [{'account': 'account', 'user': 'old'}]
+
+    def test_log_plan_diff_no_deletions(self):
+        changes = [c for c in PLAN_CHANGES
+                   if c[0] in ['create', 'update']]
+        deletions_detected, deleted_users = self.tf_client.log_plan_diff(
+            'account', iter(changes), False)
+
+        assert deletions_detected is False
+        assert deleted_users == []
+
+
+class TestTerraformClientOutputs(object):
+    def test_refresh_outputs_only_applied_accounts(self):
+        tf_client = TerraformClient('integration', '0.1.0', 'qrtf', {}, 1)
+        tf_client.specs = [{'name': 'a1', 'tf': None},
+                           {'name': 'a2', 'tf': None}]
+        read = []
+
+        def terraform_output(spec):
+            read.append(spec['name'])
+            return spec['name'], {'read': len(read)}
+        tf_client.terraform_output = terraform_output
+
+        tf_client.init_outputs()
+        assert sorted(read) == ['a1', 'a2']
+
+        tf_client.refresh_outputs()
+        assert len(read) == 2
+
+        tf_client.stale_outputs.add('a2')
+        tf_client.refresh_outputs()
+        assert read[2:] == ['a2']
+        assert tf_client.outputs['a2'] == {'read': 3}
+
+        tf_client.refresh_outputs()
+        assert len(read) == 3
+
+
+class TestTerraformClientApply(object):
+    def setup_method(self, method):
+        self.wd = tempfile.mkdtemp()
+        self.tf_client = TerraformClient('integration', '0.1.0', 'qrtf',
+                                         {}, 1)
+        self.tf_client.init_outputs()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.wd)
+
+    def plan_and_apply(self, tf):
+        spec = {'name': 'account', 'tf': tf}
+        self.tf_client.plan_changes = lambda tf, stdout, error: []
+        _, _, plan_error = self.tf_client.terraform_plan(spec, False)
+        apply_error = self.tf_client.terraform_apply(spec)
+        return plan_error, apply_error
+
+    def test_plan_is_applied(self):
+        tf = TerraformMock(self.wd)
+        open(os.path.join(self.wd, TerraformClient.PLAN_FILE), 'w').close()
+
+        assert self.plan_and_apply(tf) == (False, False)
+        assert tf.applied is True
+        assert self.tf_client.stale_outputs == set(['account'])
+        assert not os.path.exists(
+            os.path.join(self.wd, TerraformClient.PLAN_FILE))
+
+    def test_plan_state_is_recorded_after_apply(self):
+        tf = TerraformMock(self.wd)
+        open(os.path.join(self.wd, 'config.tf'), 'w').close()
+        self.tf_client.keep_working_dirs = True
+        plan_state_file = os.path.join(self.wd,
+                                       TerraformClient.PLAN_STATE_FILE)
+
+        # a plan that is not applied does not leave a plan state behind
+        self.tf_client.write_plan_state(tf)
+        self.tf_client.FULL_PLAN_INTERVAL = -1
+        spec = {'name': 'account', 'tf': tf}
+        self.tf_client.plan_changes = lambda tf, stdout, error: []
+        self.tf_client.terraform_plan(spec, False)
+        assert not os.path.exists(plan_state_file)
+
+        assert self.tf_client.terraform_apply(spec) is False
+        assert os.path.exists(plan_state_file)
+
+    def test_plan_state_is_not_recorded_after_failed_apply(self):
+        tf = TerraformMock(self.wd)
+        tf.apply_return_code = 1
+        open(os.path.join(self.wd, 'config.tf'), 'w').close()
+        self.tf_client.keep_working_dirs = True
+
+        assert self.plan_and_apply(tf) == (False, True)
+        assert not os.path.exists(
+            os.path.join(self.wd, TerraformClient.PLAN_STATE_FILE))
+
+    def test_cleanup_removes_plan_from_kept_working_dirs(self):
+        config_file = os.path.join(self.wd, 'config.tf')
+        plan_file = os.path.join(self.wd, TerraformClient.PLAN_FILE)
+        open(config_file, 'w').close()
+        open(plan_file, 'w').close()
+        tf_client = TerraformClient('integration', '0.1.0', 'qrtf',
+                                    {}, 1, keep_working_dirs=True)
+        tf_client.working_dirs = {'account': self.wd}
+
+        tf_client.cleanup()
+
+        assert os.path.exists(config_file)
+        assert not os.path.exists(plan_file)
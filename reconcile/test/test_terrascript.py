@@ -0,0 +1,103 @@
+import json
+
+from mock import patch
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from terrascript import (Terrascript, output, provider, terraform,
+                         backend, data)
+from terrascript.aws.r import aws_iam_user, aws_iam_user_policy
+
+
+class TestTerrascript(object):
+    def test_re_add_is_idempotent(self):
+        ts = Terrascript()
+        ts.add(aws_iam_user('user', name='user'))
+        ts.add(output('output', value='value'))
+        ts.add(aws_iam_user('user', name='user'))
+
+        assert [i._name for i in ts._item_list] == ['output', 'user']
+        config = json.loads(ts.dump())
+        assert list(config['resource']['aws_iam_user']) == ['user']
+
+    def test_same_name_different_type(self):
+        ts = Terrascript()
+        ts.add(aws_iam_user('user', name='user'))
+        ts.add(aws_iam_user_policy('user', user='user'))
+
+        assert len(ts._item_list) == 2
+
+    def test_render_20k_resources(self):
+        count = 20000
+
+        ts = Terrascript()
+        for i in range(count):
+            name = 'user-{}'.format(i)
+            ts.add(aws_iam_user(name, name=name))
+            # membership style duplicate adds
+            ts.add(aws_iam_user(name, name=name))
+
+        assert len(ts._item_list) == count
+
+        # every block is rendered once, and only rendered
+        # again once its item is added again
+        with patch('terrascript.json.dumps', wraps=json.dumps) as m_dumps:
+            f = StringIO()
+            ts.dump_to(f)
+            assert block_renders(m_dumps) == count
+
+            m_dumps.reset_mock()
+            ts.add(aws_iam_user('user-0', name='renamed'))
+            ts.dump_to(StringIO())
+            assert block_renders(m_dumps) == 1
+
+        config = json.loads(f.getvalue())
+        assert len(config['resource']['aws_iam_user']) == count
+
+
+def block_renders(m_dumps):
+    return len([c for c in m_dumps.call_args_list
+                if 'separators' in c[1]])
+
+
+def build_terrascript():
+    ts = Terrascript()
+    ts += provider('aws', region='us-east-1', version='~> 2.0')
+    ts += terraform(backend=backend('s3', bucket='bucket', key='key'))
+    user = ts.add(aws_iam_user('user', name='user', tags={'a': 'b'}))
+    ts.add(aws_iam_user_policy('policy', user='user', depends_on=[user]))
+    ts.add(output('output[key]', value='${aws_iam_user.user.arn}'))
+    ts.add(data('aws_iam_policy', 'data', arn='arn'))
+    return ts
+
+
+class TestTerrascriptDump(object):
+    def test_dump_to_matches_dump(self):
+        ts = build_terrascript()
+        f = StringIO()
+        ts.dump_to(f)
+
+        assert json.loads(f.getvalue()) == json.loads(ts.dump())
+        assert '\n' not in f.getvalue()
+
+    def test_dump_to_debug_is_indented(self):
+        ts = build_terrascript()
+        f = StringIO()
+        ts.dump_to(f, debug=True)
+
+        assert f.getvalue() == ts.dump()
+
+    def test_dump_to_re_add_invalidates_block(self):
+        ts = build_terrascript()
+        ts.dump_to(StringIO())
+
+        ts.add(aws_iam_user('user', name='renamed'))
+        f = StringIO()
+        ts.dump_to(f)
+
+        config = json.loads(f.getvalue())
+        assert config['resource']['aws_iam_user']['user']['name'] == \
+            'renamed'
@@ -0,0 +1,51 @@
+from mock import patch
+
+from utils.terrascript_client import TerrascriptClient
+
+
+def terrascript_client(working_dir=None):
+    with patch('utils.terrascript_client.get_config') as m_get_config:
+        m_get_config.return_value = {'terraform': {}}
+        return TerrascriptClient('integration', 'prefix', 2,
+                                 working_dir=working_dir)
+
+
+class TestTerrascriptClient(object):
+    def test_values_are_fetched_once_per_path(self):
+        ts = terrascript_client()
+
+        with patch.object(TerrascriptClient, 'fetch_values') as m_fetch:
+            m_fetch.side_effect = lambda path: {'path': path, 'tags': {}}
+
+            values = ts.get_values('/defaults.yml')
+            values['tags']['key'] = 'value'
+            ts.get_values('/other.yml')
+
+            assert ts.get_values('/defaults.yml') == \
+                {'path': '/defaults.yml', 'tags': {}}
+            assert m_fetch.call_count == 2
+
+    def test_gpg_keys_are_validated_once(self, tmpdir):
+        tf_query = [
+            {'users': [{'public_gpg_key': 'key1'},
+                       {'public_gpg_key': 'key2'},
+                       {'public_gpg_key': None}]},
+            {'users': [{'public_gpg_key': 'key2'}]},
+        ]
+
+        with patch('utils.terrascript_client.gpg_key_valid') as m_valid:
+            m_valid.side_effect = lambda key: key == 'key1'
+
+            ts = terrascript_client(working_dir=str(tmpdir))
+            ts.init_gpg_keys_valid(tf_query)
+            assert ts.is_gpg_key_valid('key1') is True
+            assert ts.is_gpg_key_valid('key2') is False
+            assert m_valid.call_count == 2
+
+            # valid keys are kept in the working directory between runs,
+            # invalid keys are validated again
+            ts = terrascript_client(working_dir=str(tmpdir))
+            ts.init_gpg_keys_valid(tf_query)
+            assert ts.is_gpg_key_valid('key1') is True
+            assert ts.is_gpg_key_valid('key2') is False
+            assert [c[0][0] for c in m_valid.call_args_list[2:]] == ['key2']
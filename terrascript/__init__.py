@@ -24,13 +24,14 @@ SORT = True
 DEBUG = False
 """Set to enable some debugging."""
 
+import json
 import logging 
 import os
 import shutil
 # from collections import defaultdict, UserDict
 # The previous line is replaced by the 2 following lines
 # in order to work with python 2
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 try:
     from collections import UserDict
 except ImportError:
@@ -69,7 +70,15 @@ class Terrascript(object):
     def __init__(self):
 
         self.config = _Config()
-        self._item_list = []
+        # Registry of added items keyed by (class, type, name), so adding
+        # an item takes constant time and re-adding an item replaces it.
+        self._items = OrderedDict()
+        # Serialized blocks, see dump_to().
+        self._rendered = {}
+
+    @property
+    def _item_list(self):
+        return list(self._items.values())
 
     def __add__(self, item):
         # Does not add EMPTY values
@@ -92,9 +101,11 @@ class Terrascript(object):
             raise KeyError(item)
 
         if not isinstance(item, Terrascript):
-            if item in self._item_list:
-                self._item_list.remove(item)
-            self._item_list.append(item)
+            self._rendered.pop(self._block_key(item), None)
+            key = (item._class, item._type, item._name)
+            # Re-added items move to the end, as they did with a list.
+            self._items.pop(key, None)
+            self._items[key] = item
 
         return self
 
@@ -112,22 +123,73 @@ class Terrascript(object):
 
     def dump(self):
         """Return the JSON representaion of config."""
-        import json
-
-        def _json_default(v):
-            # How to encode non-standard objects
-            if isinstance(v, provisioner):
-                return {v._type: v.data}
-            elif isinstance(v, UserDict):
-                return v.data
+        return json.dumps(self._filtered_config(), indent=INDENT, sort_keys=SORT, default=_json_default)
+
+    def dump_to(self, f, debug=None):
+        """Write the JSON representation of config to the file object ``f``.
+
+        The output is streamed block by block instead of being built as a
+        single string. It is compact unless debugging, in which case it is
+        indented like ``dump()``. The serialized form of every block is
+        memoized until its item is added again.
+        """
+        if debug is None:
+            debug = DEBUG
+        config = self._filtered_config()
+        if debug:
+            json.dump(config, f, indent=INDENT, sort_keys=SORT, default=_json_default)
+            return
+
+        f.write('{')
+        for i, class_ in enumerate(sorted(config)):
+            if i:
+                f.write(',')
+            f.write(json.dumps(class_) + ':')
+            blocks = config[class_]
+            if class_ == 'data':
+                f.write('[')
+                self._dump_blocks(f, (class_,), blocks[0], 2)
+                f.write(']')
+            elif class_ in THREE_TIER_ITEMS:
+                self._dump_blocks(f, (class_,), blocks, 2)
+            elif class_ in TWO_TIER_ITEMS:
+                self._dump_blocks(f, (class_,), blocks, 1)
             else:
-                return str(v)
-
+                self._dump_blocks(f, (class_,), blocks, 0)
+        f.write('}')
+
+    def _dump_blocks(self, f, key, blocks, depth):
+        if depth == 0:
+            rendered = self._rendered.get(key)
+            if rendered is None:
+                rendered = json.dumps(blocks, sort_keys=SORT, separators=(',', ':'), default=_json_default)
+                self._rendered[key] = rendered
+            f.write(rendered)
+            return
+
+        f.write('{')
+        names = sorted(blocks) if SORT else list(blocks)
+        for i, name in enumerate(names):
+            if i:
+                f.write(',')
+            f.write(json.dumps(name) + ':')
+            self._dump_blocks(f, key + (name,), blocks[name], depth - 1)
+        f.write('}')
+
+    def _filtered_config(self):
         # Work on copy of _Config but with unused top-level elements removed.
         #
-        config = {k: v for k,v in self.config.items() if v}
-        return json.dumps(config, indent=INDENT, sort_keys=SORT, default=_json_default)
+        return {k: v for k,v in self.config.items() if v}
 
+    @staticmethod
+    def _block_key(item):
+        """Key of the memoized serialized block of an item."""
+        if item._class in THREE_TIER_ITEMS:
+            return (item._class, item._type, item._name)
+        elif item._class in TWO_TIER_ITEMS:
+            return (item._class, item._name)
+        else:
+            return (item._class,)
 
     def validate(self, tmpdir):
         """Validate a Terraform configuration."""
@@ -141,6 +203,16 @@ class Terrascript(object):
         return proc.returncode == 0
 
 
+def _json_default(v):
+    # How to encode non-standard objects
+    if isinstance(v, provisioner):
+        return {v._type: v.data}
+    elif isinstance(v, UserDict):
+        return v.data
+    else:
+        return str(v)
+
+
 class _base(object):
     _class = None
     """One of 'resource', 'data', 'module', etc."""
@@ -1,23 +1,42 @@
 import logging
 import boto3
 import botocore
+import botocore.loaders
+import botocore.session
 import json
 import os
+import threading
+import time
 
 import utils.vault_client as vault_client
 
 from utils.config import get_config
 
 from multiprocessing.dummy import Pool as ThreadPool
+from functools import partial
+from threading import BoundedSemaphore, Lock
+
+# service models are loaded from disk once per process
+# and shared by the clients of all sessions
+DATA_LOADER = botocore.loaders.create_loader()
 
 
 class AWSApi(object):
     """Wrapper around AWS SDK"""
 
+    # resource types to read from the resource groups tagging api
+    TAGGED_TYPES = ['s3', 'sqs', 'dynamodb:table', 'rds:db', 'rds:snapshot']
+    # delete_objects accepts up to 1000 keys per request
+    DELETE_OBJECTS_BATCH_SIZE = 1000
+    DELETE_OBJECTS_POOL_SIZE = 4
+
     def __init__(self, thread_pool_size):
         self.thread_pool_size = thread_pool_size
         self.init_sessions()
+        self.init_clients()
         self.init_users()
+        logging.info(['aws_client_setup', len(self.clients),
+                      '{:.2f}s'.format(self.client_setup_time)])
 
     def init_sessions(self):
         config = get_config()
@@ -27,17 +46,13 @@ class AWSApi(object):
         pool = ThreadPool(self.thread_pool_size)
         results = pool.map(self.get_vault_tf_secrets, vault_specs)
 
-        self.sessions = {}
+        self.credentials = {}
         for account, secret in results:
-            access_key = secret['aws_access_key_id']
-            secret_key = secret['aws_secret_access_key']
-            region_name = secret['region']
-            session = boto3.Session(
-                aws_access_key_id=access_key,
-                aws_secret_access_key=secret_key,
-                region_name=region_name,
-            )
-            self.sessions[account] = session
+            self.credentials[account] = {
+                'aws_access_key_id': secret['aws_access_key_id'],
+                'aws_secret_access_key': secret['aws_secret_access_key'],
+                'region_name': secret['region'],
+            }
 
     def init_vault_tf_secret_specs(self):
         vault_specs = []
@@ -54,11 +69,47 @@ class AWSApi(object):
         secret = vault_client.read_all(secrets_path + '/config')
         return (account, secret)
 
+    def init_clients(self):
+        # boto3 sessions are not thread safe,
+        # every thread gets its own sessions and clients
+        self.sessions = {}
+        self.clients = {}
+        self.client_setup_time = 0
+        self._clients_lock = Lock()
+
+    def get_session(self, account):
+        key = (account, threading.current_thread().ident)
+        with self._clients_lock:
+            session = self.sessions.get(key)
+        if session is None:
+            botocore_session = botocore.session.get_session()
+            botocore_session.register_component('data_loader', DATA_LOADER)
+            session = boto3.Session(botocore_session=botocore_session,
+                                    **self.credentials[account])
+            with self._clients_lock:
+                self.sessions[key] = session
+        return session
+
+    def get_client(self, account, service, region=None):
+        session = self.get_session(account)
+        region = region or session.region_name
+        key = (account, service, region, threading.current_thread().ident)
+        with self._clients_lock:
+            client = self.clients.get(key)
+        if client is None:
+            start = time.time()
+            client = session.client(service, region_name=region)
+            with self._clients_lock:
+                self.clients[key] = client
+                self.client_setup_time += time.time() - start
+        return client
+
     def init_users(self):
         self.users = {}
-        for account, s in self.sessions.items():
-            iam = s.client('iam')
-            users = [u['UserName'] for u in iam.list_users()['Users']]
+        for account in self.credentials:
+            iam = self.get_client(account, 'iam')
+            users = set(u['UserName']
+                        for u in self.paginate(iam, 'list_users', 'Users'))
             self.users[account] = users
 
     def simulate_deleted_users(self, io_dir):
@@ -74,185 +125,243 @@ class AWSApi(object):
             for deleted_user in deleted_users:
                 delete_from_account = deleted_user['account']
                 delete_user = deleted_user['user']
-                self.users[delete_from_account].remove(delete_user)
+                self.users[delete_from_account].discard(delete_user)
 
     def map_resources(self):
         self.resources = {}
         for account, _ in self.accounts:
             self.resources[account] = {}
 
-        self.map_s3_resources()
-        self.map_sqs_resources()
-        self.map_dynamodb_resources()
-        self.map_rds_resources()
-        self.map_rds_snapshots()
-
-    def map_s3_resources(self):
-        for account, s in self.sessions.items():
-            s3 = s.client('s3')
-            buckets_list = s3.list_buckets()
-            if 'Buckets' not in buckets_list:
-                continue
-            buckets = [b['Name'] for b in buckets_list['Buckets']]
-            self.resources[account]['s3'] = buckets
-            buckets_without_owner = \
-                self.get_resources_without_owner(account, buckets)
-            unfiltered_buckets = \
-                self.custom_s3_filter(account, s3, buckets_without_owner)
-            self.resources[account]['s3_no_owner'] = unfiltered_buckets
-
-    def map_sqs_resources(self):
-        for account, s in self.sessions.items():
-            sqs = s.client('sqs')
-            queues_list = sqs.list_queues()
-            if 'QueueUrls' not in queues_list:
-                continue
-            queues = queues_list['QueueUrls']
-            self.resources[account]['sqs'] = queues
-            queues_without_owner = \
-                self.get_resources_without_owner(account, queues)
-            unfiltered_queues = \
-                self.custom_sqs_filter(account, sqs, queues_without_owner)
-            self.resources[account]['sqs_no_owner'] = unfiltered_queues
-
-    def map_dynamodb_resources(self):
-        for account, s in self.sessions.items():
-            dynamodb = s.client('dynamodb')
-            tables_list = dynamodb.list_tables()
-            if 'TableNames' not in tables_list:
-                continue
-            tables = tables_list['TableNames']
-            self.resources[account]['dynamodb'] = tables
-            tables_without_owner = \
-                self.get_resources_without_owner(account, tables)
-            unfiltered_tables = \
-                self.custom_dynamodb_filter(
-                    account,
-                    s,
-                    dynamodb,
-                    tables_without_owner
-                )
-            self.resources[account]['dynamodb_no_owner'] = unfiltered_tables
-
-    def map_rds_resources(self):
-        for account, s in self.sessions.items():
-            rds = s.client('rds')
-            instances_list = rds.describe_db_instances()
-            if 'DBInstances' not in instances_list:
-                continue
-            instances = [t['DBInstanceIdentifier']
-                         for t in instances_list['DBInstances']]
-            self.resources[account]['rds'] = instances
-            instances_without_owner = \
-                self.get_resources_without_owner(account, instances)
-            unfiltered_instances = \
-                self.custom_rds_filter(account, rds, instances_without_owner)
-            self.resources[account]['rds_no_owner'] = unfiltered_instances
-
-    def map_rds_snapshots(self):
-        for account, s in self.sessions.items():
-            rds = s.client('rds')
-            snapshots_list = rds.describe_db_snapshots()
-            if 'DBSnapshots' not in snapshots_list:
-                continue
-            snapshots = [t['DBSnapshotIdentifier']
-                         for t in snapshots_list['DBSnapshots']]
-            self.resources[account]['rds_snapshots'] = snapshots
-            snapshots_without_db = \
-                [t['DBSnapshotIdentifier']
-                 for t in snapshots_list['DBSnapshots']
-                 if t['DBInstanceIdentifier'] not in
-                 self.resources[account]['rds']]
-            unfiltered_snapshots = \
-                self.custom_rds_snapshot_filter(account, rds,
-                                                snapshots_without_db)
-            self.resources[account]['rds_snapshots_no_owner'] = \
-                unfiltered_snapshots
+        self.owner_indexes = {}
+        for account in self.credentials:
+            self.init_owner_index(account)
+
+        self.tags = {}
+        pool = ThreadPool(self.thread_pool_size)
+        pool.map(self.map_tags, self.credentials.keys())
+
+        map_specs = self.init_map_specs()
+        pool.map(self.map_account_resources, map_specs)
+
+    def init_map_specs(self):
+        map_specs = []
+        for account in self.credentials:
+            for service in ['s3', 'sqs', 'dynamodb', 'rds']:
+                map_spec = {'account': account,
+                            'service': service}
+                map_specs.append(map_spec)
+        return map_specs
+
+    def map_account_resources(self, map_spec):
+        account = map_spec['account']
+        service = map_spec['service']
+        if service == 's3':
+            self.map_s3_resources(account)
+        elif service == 'sqs':
+            self.map_sqs_resources(account)
+        elif service == 'dynamodb':
+            self.map_dynamodb_resources(account)
+        elif service == 'rds':
+            # snapshots are matched against the mapped instances
+            self.map_rds_resources(account)
+            self.map_rds_snapshots(account)
+
+    def map_s3_resources(self, account):
+        s3 = self.get_client(account, 's3')
+        buckets = (b['Name']
+                   for b in self.paginate(s3, 'list_buckets', 'Buckets'))
+        buckets_without_owner = \
+            self.get_resources_without_owner(account, buckets)
+        unfiltered_buckets = \
+            self.custom_s3_filter(account, s3, buckets_without_owner)
+        self.resources[account]['s3_no_owner'] = unfiltered_buckets
+
+    def map_sqs_resources(self, account):
+        sqs = self.get_client(account, 'sqs')
+        queues = self.paginate(sqs, 'list_queues', 'QueueUrls')
+        queues_without_owner = \
+            self.get_resources_without_owner(account, queues)
+        unfiltered_queues = \
+            self.custom_sqs_filter(account, queues_without_owner)
+        self.resources[account]['sqs_no_owner'] = unfiltered_queues
+
+    def map_dynamodb_resources(self, account):
+        dynamodb = self.get_client(account, 'dynamodb')
+        tables = self.paginate(dynamodb, 'list_tables', 'TableNames')
+        tables_without_owner = \
+            self.get_resources_without_owner(account, tables)
+        unfiltered_tables = \
+            self.custom_dynamodb_filter(account, tables_without_owner)
+        self.resources[account]['dynamodb_no_owner'] = unfiltered_tables
+
+    def map_rds_resources(self, account):
+        rds = self.get_client(account, 'rds')
+        instances = set(
+            t['DBInstanceIdentifier'] for t in
+            self.paginate(rds, 'describe_db_instances', 'DBInstances'))
+        # kept to find snapshots of deleted instances
+        self.resources[account]['rds'] = instances
+        instances_without_owner = \
+            self.get_resources_without_owner(account, sorted(instances))
+        unfiltered_instances = \
+            self.custom_rds_filter(account, instances_without_owner)
+        self.resources[account]['rds_no_owner'] = unfiltered_instances
+
+    def map_rds_snapshots(self, account):
+        rds = self.get_client(account, 'rds')
+        instances = self.resources[account].get('rds', set())
+        snapshots_without_db = \
+            (t['DBSnapshotIdentifier'] for t in
+             self.paginate(rds, 'describe_db_snapshots', 'DBSnapshots')
+             if t['DBInstanceIdentifier'] not in instances)
+        unfiltered_snapshots = \
+            self.custom_rds_snapshot_filter(account, snapshots_without_db)
+        self.resources[account]['rds_snapshots_no_owner'] = \
+            unfiltered_snapshots
+
+    @staticmethod
+    def paginate(client, method, key, **kwargs):
+        """Yields the items of every page of a listing."""
+        if not client.can_paginate(method):
+            # some listings have no paginator in older botocore versions
+            for item in getattr(client, method)(**kwargs).get(key, []):
+                yield item
+            return
+        for page in client.get_paginator(method).paginate(**kwargs):
+            for item in page.get(key, []):
+                yield item
 
     def get_resources_without_owner(self, account, resources):
-        return [r for r in resources if not self.has_owner(account, r)]
+        return (r for r in resources if not self.has_owner(account, r))
 
-    def has_owner(self, account, resource):
-        has_owner = False
+    def init_owner_index(self, account):
+        """Builds a prefix tree of the lowercase user names of an account.
+
+        Every node is a dict of the next characters, a None key marks the
+        end of a user name.
+        """
+        index = {}
         for u in self.users[account]:
-            if resource.lower().startswith(u.lower()):
-                has_owner = True
-                break
-            if '://' in resource:
-                if resource.split('/')[-1].startswith(u.lower()):
-                    has_owner = True
-                    break
-        return has_owner
+            node = index
+            for c in u.lower():
+                node = node.setdefault(c, {})
+            node[None] = True
+        self.owner_indexes[account] = index
+
+    @staticmethod
+    def has_prefix(index, name):
+        node = index
+        for c in name:
+            if None in node:
+                return True
+            node = node.get(c)
+            if node is None:
+                return False
+        return None in node
+
+    def has_owner(self, account, resource):
+        index = self.owner_indexes[account]
+        if self.has_prefix(index, resource.lower()):
+            return True
+        if '://' in resource:
+            if self.has_prefix(index, resource.split('/')[-1]):
+                return True
+        return False
 
     def custom_s3_filter(self, account, s3, buckets):
         type = 's3 bucket'
         unfiltered_buckets = []
         for b in buckets:
-            try:
-                tags = s3.get_bucket_tagging(Bucket=b)
-            except botocore.exceptions.ClientError:
-                tags = {}
-            if not self.should_filter(account, type, b, tags, 'TagSet'):
+            tags = self.get_resource_tags(account, 's3', b)
+            if tags is None:
+                # the tagging api only returns buckets of the
+                # session's region, ask about the others directly
+                try:
+                    tags = s3.get_bucket_tagging(Bucket=b)['TagSet']
+                except botocore.exceptions.ClientError:
+                    tags = []
+            if not self.should_filter(account, type, b, tags):
                 unfiltered_buckets.append(b)
 
         return unfiltered_buckets
 
-    def custom_sqs_filter(self, account, sqs, queues):
+    def custom_sqs_filter(self, account, queues):
         type = 'sqs queue'
         unfiltered_queues = []
         for q in queues:
-            tags = sqs.list_queue_tags(QueueUrl=q)
-            if not self.should_filter(account, type, q, tags, 'Tags'):
+            queue_name = q.split('/')[-1]
+            tags = self.get_resource_tags(account, 'sqs', queue_name)
+            if not self.should_filter(account, type, q, tags):
                 unfiltered_queues.append(q)
 
         return unfiltered_queues
 
-    def custom_dynamodb_filter(self, account, session, dynamodb, tables):
+    def custom_dynamodb_filter(self, account, tables):
         type = 'dynamodb table'
-        dynamodb_resource = session.resource('dynamodb')
         unfiltered_tables = []
         for t in tables:
-            table_arn = dynamodb_resource.Table(t).table_arn
-            tags = dynamodb.list_tags_of_resource(ResourceArn=table_arn)
-            if not self.should_filter(account, type, t, tags, 'Tags'):
+            tags = self.get_resource_tags(account, 'dynamodb', 'table/' + t)
+            if not self.should_filter(account, type, t, tags):
                 unfiltered_tables.append(t)
 
         return unfiltered_tables
 
-    def custom_rds_filter(self, account, rds, instances):
+    def custom_rds_filter(self, account, instances):
         type = 'rds instance'
         unfiltered_instances = []
         for i in instances:
-            instance = rds.describe_db_instances(DBInstanceIdentifier=i)
-            instance_arn = instance['DBInstances'][0]['DBInstanceArn']
-            tags = rds.list_tags_for_resource(ResourceName=instance_arn)
-            if not self.should_filter(account, type, i, tags, 'TagList'):
+            tags = self.get_resource_tags(account, 'rds', 'db:' + i)
+            if not self.should_filter(account, type, i, tags):
                 unfiltered_instances.append(i)
 
         return unfiltered_instances
 
-    def custom_rds_snapshot_filter(self, account, rds, snapshots):
+    def custom_rds_snapshot_filter(self, account, snapshots):
         type = 'rds snapshots'
         unfiltered_snapshots = []
         for s in snapshots:
-            snapshot = rds.describe_db_snapshots(DBSnapshotIdentifier=s)
-            snapshot_arn = snapshot['DBSnapshots'][0]['DBSnapshotArn']
-            tags = rds.list_tags_for_resource(ResourceName=snapshot_arn)
-            if not self.should_filter(account, type, s, tags, 'TagList'):
+            tags = self.get_resource_tags(account, 'rds', 'snapshot:' + s)
+            if not self.should_filter(account, type, s, tags):
                 unfiltered_snapshots.append(s)
 
         return unfiltered_snapshots
 
+    def map_tags(self, account):
+        tagging = self.get_client(account, 'resourcegroupstaggingapi')
+        mappings = self.paginate(tagging, 'get_resources',
+                                 'ResourceTagMappingList',
+                                 ResourceTypeFilters=self.TAGGED_TYPES)
+        tags = {}
+        for mapping in mappings:
+            tags[self.arn_key(mapping['ResourceARN'])] = mapping['Tags']
+        self.tags[account] = tags
+
+    @staticmethod
+    def arn_key(arn):
+        # arn:partition:service:region:account-id:resource
+        arn_split = arn.split(':', 5)
+        return (arn_split[2], arn_split[5])
+
+    def get_resource_tags(self, account, service, resource):
+        """Returns the tags of a resource from the account's tag index.
+
+        Resources that were never tagged are not returned by the tagging
+        api and get an empty list, except for s3 buckets, which may be in
+        another region and get None.
+        """
+        tags = self.tags[account].get((service, resource))
+        if tags is None and service != 's3':
+            return []
+        return tags
+
     def should_filter(self, account, resource_type,
-                      resource_name, resource_tags, tags_key):
+                      resource_name, tags):
         if self.resource_has_special_name(account, resource_type,
                                           resource_name):
             return True
-        if tags_key in resource_tags:
-            tags = resource_tags[tags_key]
-            if self.resource_has_special_tags(account, resource_type,
-                                              resource_name, tags):
-                return True
+        if self.resource_has_special_tags(account, resource_type,
+                                          resource_name, tags):
+            return True
 
         return False
 
@@ -314,47 +423,94 @@ class AWSApi(object):
                           'with the \'--enable-deletion\' flag.'
 
         resource_types = ['s3', 'sqs', 'dynamodb', 'rds', 'rds_snapshots']
-        for account, s in self.sessions.items():
+        for account in self.credentials:
             for rt in resource_types:
                 for r in self.resources[account].get(rt + '_no_owner', []):
                     logging.info(['delete_resource', rt, account, r])
                     if not dry_run:
                         if enable_deletion:
-                            self.delete_resource(s, rt, r)
+                            self.delete_resource(account, rt, r)
                         else:
                             logging.warning(warning_message)
 
-    def delete_resource(self, session, resource_type, resource_name):
+    def delete_resource(self, account, resource_type, resource_name):
         if resource_type == 's3':
-            resource = session.resource(resource_type)
-            self.delete_bucket(resource, resource_name)
+            client = self.get_client(account, resource_type)
+            self.delete_bucket(client, resource_name)
         elif resource_type == 'sqs':
-            client = session.client(resource_type)
+            client = self.get_client(account, resource_type)
             self.delete_queue(client, resource_name)
         elif resource_type == 'dynamodb':
-            resource = session.resource(resource_type)
-            self.delete_table(resource, resource_name)
+            client = self.get_client(account, resource_type)
+            self.delete_table(client, resource_name)
         elif resource_type == 'rds':
-            client = session.client(resource_type)
+            client = self.get_client(account, resource_type)
             self.delete_instance(client, resource_name)
         elif resource_type == 'rds_snapshots':
-            client = session.client(resource_type)
+            client = self.get_client(account, 'rds')
             self.delete_snapshot(client, resource_name)
         else:
             raise Exception('invalid resource type: ' + resource_type)
 
     def delete_bucket(self, s3, bucket_name):
-        bucket = s3.Bucket(bucket_name)
-        for key in bucket.objects.all():
-            key.delete()
-        bucket.delete()
+        # deleting objects is idempotent, an interrupted run is
+        # resumed by listing and deleting the remaining objects
+        # the listing is only allowed to get a few batches ahead
+        # of the deletions to keep memory flat
+        pending = BoundedSemaphore(2 * self.DELETE_OBJECTS_POOL_SIZE)
+        batches = self.get_object_version_batches(s3, bucket_name, pending)
+        delete_objects_partial = \
+            partial(self.delete_objects, s3, bucket_name, pending)
+        pool = ThreadPool(self.DELETE_OBJECTS_POOL_SIZE)
+        deleted = 0
+        errors = 0
+        for batch_deleted, batch_errors in \
+                pool.imap_unordered(delete_objects_partial, batches):
+            deleted += batch_deleted
+            errors += batch_errors
+            logging.info(['delete_bucket_objects', bucket_name, deleted])
+        pool.close()
+        if errors:
+            raise Exception('{} objects could not be deleted '
+                            'from bucket {}'.format(errors, bucket_name))
+        s3.delete_bucket(Bucket=bucket_name)
+
+    def get_object_version_batches(self, s3, bucket_name, pending):
+        """Yields batches of all object versions and delete markers."""
+        paginator = s3.get_paginator('list_object_versions')
+        batch = []
+        for page in paginator.paginate(Bucket=bucket_name):
+            versions = page.get('Versions', []) + \
+                page.get('DeleteMarkers', [])
+            for v in versions:
+                batch.append({'Key': v['Key'], 'VersionId': v['VersionId']})
+                if len(batch) == self.DELETE_OBJECTS_BATCH_SIZE:
+                    pending.acquire()
+                    yield batch
+                    batch = []
+        if batch:
+            pending.acquire()
+            yield batch
+
+    def delete_objects(self, s3, bucket_name, pending, objects):
+        try:
+            response = s3.delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': objects, 'Quiet': True}
+            )
+        finally:
+            pending.release()
+        errors = response.get('Errors', [])
+        for e in errors:
+            logging.error(['delete_object', bucket_name,
+                           e['Key'], e.get('VersionId'), e['Message']])
+        return len(objects) - len(errors), len(errors)
 
     def delete_queue(self, sqs, queue_url):
         sqs.delete_queue(QueueUrl=queue_url)
 
     def delete_table(self, dynamodb, table_name):
-        table = dynamodb.Table(table_name)
-        table.delete()
+        dynamodb.delete_table(TableName=table_name)
 
     def delete_instance(self, rds, instance_name):
         rds.delete_db_instance(
@@ -369,37 +525,50 @@ class AWSApi(object):
         )
 
     def delete_keys(self, dry_run, keys_to_delete):
-        users_keys = self.get_users_keys()
-        for account, s in self.sessions.items():
-            iam = s.client('iam')
-            keys = keys_to_delete.get(account, [])
-            for key in keys:
-                user = [user for user, user_keys
-                        in users_keys[account].items()
-                        if key in user_keys]
-                if not user:
+        accounts = [a for a in self.credentials if keys_to_delete.get(a)]
+        keys_users = self.get_keys_users(accounts)
+
+        delete_specs = []
+        for account in accounts:
+            for key in keys_to_delete[account]:
+                user = keys_users[account].get(key)
+                if user is None:
                     continue
-                # unpack single item from sequence
-                # since only a single user can have a given key
-                [user] = user
-
                 logging.info(['delete_key', account, user, key])
+                delete_spec = {'account': account,
+                               'user': user,
+                               'key': key}
+                delete_specs.append(delete_spec)
+
+        if not dry_run:
+            pool = ThreadPool(self.thread_pool_size)
+            pool.map(self.delete_key, delete_specs)
+
+    def delete_key(self, delete_spec):
+        iam = self.get_client(delete_spec['account'], 'iam')
+        iam.delete_access_key(
+            UserName=delete_spec['user'],
+            AccessKeyId=delete_spec['key']
+        )
 
-                if not dry_run:
-                    iam.delete_access_key(
-                        UserName=user,
-                        AccessKeyId=key
-                    )
+    def get_keys_users(self, accounts):
+        """Returns a map of access key ids to user names per account."""
+        user_specs = [(account, user)
+                      for account in accounts
+                      for user in self.users[account]]
+        pool = ThreadPool(self.thread_pool_size)
+        results = pool.map(self.get_user_keys, user_specs)
 
-    def get_users_keys(self):
-        users_keys = {}
-        for account, s in self.sessions.items():
-            iam = s.client('iam')
-            users_keys[account] = {user: self.get_user_keys(iam, user)
-                                   for user in self.users[account]}
+        keys_users = {account: {} for account in accounts}
+        for (account, user), keys in zip(user_specs, results):
+            for key in keys:
+                keys_users[account][key] = user
 
-        return users_keys
+        return keys_users
 
-    def get_user_keys(self, iam, user):
-        key_list = iam.list_access_keys(UserName=user)['AccessKeyMetadata']
+    def get_user_keys(self, user_spec):
+        account, user = user_spec
+        iam = self.get_client(account, 'iam')
+        key_list = self.paginate(iam, 'list_access_keys',
+                                 'AccessKeyMetadata', UserName=user)
         return [uk['AccessKeyId'] for uk in key_list]
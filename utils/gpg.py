@@ -1,18 +1,33 @@
 import os
 import base64
+import hashlib
+import shutil
+import tempfile
 
 from subprocess import PIPE, Popen, STDOUT
 
 
 def gpg_key_valid(public_gpg_key):
-    DEVNULL = open(os.devnull, 'w')
     try:
         public_gpg_key_dec = base64.b64decode(public_gpg_key)
     except Exception:
         return False
-    proc = Popen(['gpg'], stdin=PIPE, stdout=DEVNULL, stderr=STDOUT)
-    proc.communicate(public_gpg_key_dec)
+
+    # use an empty keyring so the result does not depend on
+    # the keyring of the user running the integration
+    homedir = tempfile.mkdtemp()
+    try:
+        with open(os.devnull, 'w') as devnull:
+            proc = Popen(['gpg', '--homedir', homedir, '--batch'],
+                         stdin=PIPE, stdout=devnull, stderr=STDOUT)
+            proc.communicate(public_gpg_key_dec)
+    finally:
+        shutil.rmtree(homedir, ignore_errors=True)
 
     if proc.returncode != 0:
         return False
     return True
+
+
+def gpg_key_digest(public_gpg_key):
+    return hashlib.sha256(public_gpg_key.encode('utf-8')).hexdigest()
@@ -8,6 +8,8 @@ import logging
 
 import jumpssh
 
+from threading import Lock
+
 import utils.gql as gql
 import utils.vault_client as vault_client
 
@@ -100,15 +102,27 @@ class JumpHostSSHRestApi(JumpHostBase):
 
         self.init_ssh_session()
         self.default_logging = logging.getLogger().level
+        # the ssh session is opened and closed for every request,
+        # requests from multiple threads have to go through it one by one
+        self._session_lock = Lock()
 
     def __enter__(self):
-        logging.getLogger().setLevel(logging.WARNING)
-        gateway_session = self.get_ssh_session().open()
-        return jumpssh.RestSshClient(gateway_session, silent=True)
+        self._session_lock.acquire()
+        try:
+            logging.getLogger().setLevel(logging.WARNING)
+            gateway_session = self.get_ssh_session().open()
+            return jumpssh.RestSshClient(gateway_session, silent=True)
+        except Exception:
+            logging.getLogger().setLevel(self.default_logging)
+            self._session_lock.release()
+            raise
 
     def __exit__(self, *args):
-        self.get_ssh_session().close()
-        logging.getLogger().setLevel(self.default_logging)
+        try:
+            self.get_ssh_session().close()
+            logging.getLogger().setLevel(self.default_logging)
+        finally:
+            self._session_lock.release()
 
     def init_ssh_session(self):
         session = jumpssh.SSHSession(
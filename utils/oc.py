@@ -2,6 +2,8 @@ from subprocess import Popen, PIPE
 import json
 import time
 
+from threading import Lock
+
 from utils.jump_host import JumpHostSSH
 
 
@@ -26,6 +28,8 @@ class OC(object):
             oc_base_cmd = self.jump_host.get_ssh_base_cmd() + oc_base_cmd
 
         self.oc_base_cmd = oc_base_cmd
+        self.projects = None
+        self._projects_lock = Lock()
 
     def whoami(self):
         return self._run(['whoami'])
@@ -81,7 +85,25 @@ class OC(object):
         cmd = ['delete', '-n', namespace, kind, name]
         self._run(cmd)
 
+    def get_project_names(self):
+        with self._projects_lock:
+            return set(self._get_project_names())
+
+    def _get_project_names(self):
+        # projects are listed once and cached for the rest of the run,
+        # the cache is kept up to date by new_project and delete_project.
+        # callers must hold _projects_lock
+        if self.projects is None:
+            projects = self.get_all('Project')['items']
+            self.projects = set([p['metadata']['name'] for p in projects])
+        return self.projects
+
     def project_exists(self, name):
+        with self._projects_lock:
+            if name in self._get_project_names():
+                return True
+        # the listing only has the projects we can see,
+        # any other project is checked on its own
         try:
             self.get(None, 'Project', name)
         except StatusCodeError as e:
@@ -89,15 +111,25 @@ class OC(object):
                 return False
             else:
                 raise e
+        self._add_project_name(name)
         return True
 
+    def _add_project_name(self, name):
+        with self._projects_lock:
+            if self.projects is not None:
+                self.projects.add(name)
+
     def new_project(self, namespace):
         cmd = ['new-project', namespace]
         self._run(cmd)
+        self._add_project_name(namespace)
 
     def delete_project(self, namespace):
         cmd = ['delete', 'project', namespace]
         self._run(cmd)
+        with self._projects_lock:
+            if self.projects is not None:
+                self.projects.discard(namespace)
 
     def get_group_if_exists(self, name):
         try:
@@ -116,12 +148,12 @@ class OC(object):
         cmd = ['delete', 'group', group]
         self._run(cmd)
 
-    def add_user_to_group(self, group, user):
-        cmd = ['adm', 'groups', 'add-users', group, user]
+    def add_users_to_group(self, group, users):
+        cmd = ['adm', 'groups', 'add-users', group] + users
         self._run(cmd)
 
-    def del_user_from_group(self, group, user):
-        cmd = ['adm', 'groups', 'remove-users', group, user]
+    def del_users_from_group(self, group, users):
+        cmd = ['adm', 'groups', 'remove-users', group] + users
         self._run(cmd)
 
     def _run(self, cmd, **kwargs):
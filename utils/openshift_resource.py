@@ -223,6 +223,14 @@ class ResourceInventory(object):
                 self._clusters[cluster][namespace][resource_type]['current']
             current[name] = value
 
+    def get_current(self, cluster, namespace, resource_type, name):
+        # raises KeyError if the resource type was not initialized
+        # for this cluster/namespace (its current state was not fetched)
+        with self._lock:
+            current = \
+                self._clusters[cluster][namespace][resource_type]['current']
+            return current.get(name)
+
     def __iter__(self):
         for cluster in self._clusters.keys():
             for namespace in self._clusters[cluster].keys():
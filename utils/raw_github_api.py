@@ -1,7 +1,72 @@
+import os
+import json
 import time
+import hashlib
 import requests
 
 
+ORG_MEMBERS_QUERY = """
+query ($org: String!, $after: String) {
+  organization(login: $org) {
+    membersWithRole(first: 100, after: $after) {
+      nodes {
+        login
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+"""
+
+ORG_TEAMS_QUERY = """
+query ($org: String!, $after: String) {
+  organization(login: $org) {
+    teams(first: 50, after: $after) {
+      nodes {
+        databaseId
+        name
+        slug
+        members(first: 100) {
+          nodes {
+            login
+          }
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+"""
+
+TEAM_MEMBERS_QUERY = """
+query ($org: String!, $slug: String!, $after: String) {
+  organization(login: $org) {
+    team(slug: $slug) {
+      members(first: 100, after: $after) {
+        nodes {
+          login
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+  }
+}
+"""
+
+
 class RawGithubApi(object):
     """
     REST based GH interface
@@ -11,13 +76,20 @@ class RawGithubApi(object):
     """
 
     BASE_URL = "https://api.github.com"
+    GRAPHQL_URL = BASE_URL + "/graphql"
     BASE_HEADERS = {
         'Accept': 'application/vnd.github.v3+json,'
         'application/vnd.github.dazzler-preview+json'
     }
 
-    def __init__(self, password):
+    def __init__(self, password, cache_dir=None):
         self.password = password
+        # list responses are kept on disk and revalidated with their
+        # ETag, GitHub does not count 304 responses against the rate limit
+        self.cache_dir = cache_dir
+        self.rate_limit = {}
+        self.requests = 0
+        self.not_modified = 0
 
     def headers(self, headers={}):
         new_headers = headers.copy()
@@ -33,11 +105,30 @@ class RawGithubApi(object):
     def query(self, url, headers={}):
         h = self.headers(headers)
 
+        result, links = self.get(self.BASE_URL + url, h)
+
+        if isinstance(result, list):
+            elements = list(result)
+
+            while 'next' in links:
+                result, links = self.get(links['next']['url'], h)
+                elements.extend(result)
+
+            return elements
+
+        return result
+
+    def get(self, url, headers):
+        cached = self.read_cache(url)
+        h = headers.copy()
+        if cached is not None:
+            h['If-None-Match'] = cached['etag']
+
         attempt = 0
         attempts = 3
         while attempt < attempts:
             try:
-                res = requests.get(self.BASE_URL + url, headers=h)
+                res = requests.get(url, headers=h)
                 res.raise_for_status()
                 break
             except Exception as e:
@@ -47,43 +138,144 @@ class RawGithubApi(object):
                 else:
                     time.sleep(attempt)
 
-        result = res.json()
+        self.requests += 1
+        self.update_rate_limit(res)
 
-        if isinstance(result, list):
-            elements = []
+        if res.status_code == 304:
+            self.not_modified += 1
+            return cached['body'], cached['links']
 
-            for element in result:
-                elements.append(element)
+        body = res.json()
+        etag = res.headers.get('ETag')
+        if etag is not None:
+            self.write_cache(url, {'etag': etag,
+                                   'body': body,
+                                   'links': res.links})
+        return body, res.links
 
-            while 'last' in res.links and 'next' in res.links:
-                if res.links['last']['url'] == res.links['next']['url']:
-                    req_url = res.links['next']['url']
-                    res = requests.get(req_url, headers=h)
+    def update_rate_limit(self, res):
+        for key in ['limit', 'remaining', 'reset']:
+            value = res.headers.get('X-RateLimit-' + key.capitalize())
+            if value is not None:
+                self.rate_limit[key] = int(value)
 
-                    try:
-                        res.raise_for_status()
-                    except Exception as e:
-                        raise Exception(e.message)
+    def metrics(self):
+        """Returns rate limit and cache metrics of this instance."""
+        metrics = {'requests': self.requests,
+                   'not_modified': self.not_modified}
+        for key, value in self.rate_limit.items():
+            metrics['rate_limit_' + key] = value
+        return metrics
 
-                    for element in res.json():
-                        elements.append(element)
+    def cache_file(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.json')
 
-                    return elements
-                else:
-                    req_url = res.links['next']['url']
-                    res = requests.get(req_url, headers=h)
+    def read_cache(self, url):
+        if self.cache_dir is None:
+            return None
+        path = self.cache_file(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except ValueError:
+            return None
 
-                    try:
-                        res.raise_for_status()
-                    except Exception as e:
-                        raise Exception(e.message)
+    def write_cache(self, url, data):
+        if self.cache_dir is None:
+            return
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        path = self.cache_file(url)
+        # write to a temporary file first, an interrupted run
+        # must not leave a partial response behind
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, path)
 
-                    for element in res.json():
-                        elements.append(element)
+    def org_members(self, org):
+        members = self.query('/orgs/{}/members'.format(org))
+        return [member['login'] for member in members]
 
-            return elements
+    def org_teams(self, org):
+        return self.query('/orgs/{}/teams'.format(org))
 
-        return result
+    def team_members(self, team_id):
+        members = self.query('/teams/{}/members'.format(team_id))
+        return [member['login'] for member in members]
+
+    def graphql(self, query, variables):
+        res = requests.post(self.GRAPHQL_URL,
+                            headers=self.headers(),
+                            json={'query': query, 'variables': variables})
+        res.raise_for_status()
+        self.update_rate_limit(res)
+        result = res.json()
+        if result.get('errors'):
+            raise Exception(result['errors'])
+        return result['data']
+
+    def graphql_nodes(self, query, variables, path, after=None):
+        """Yields the nodes of all pages of a GraphQL connection.
+
+        path is the list of keys leading to the connection in the
+        response data, the query has to accept an $after cursor.
+        """
+        while True:
+            variables = dict(variables, after=after)
+            connection = self.graphql(query, variables)
+            for key in path:
+                connection = connection[key]
+            for node in connection['nodes']:
+                yield node
+            page_info = connection['pageInfo']
+            if not page_info['hasNextPage']:
+                break
+            after = page_info['endCursor']
+
+    def org_state(self, org):
+        """Returns the members and teams of an org in a few requests.
+
+        Members and teams come from GraphQL queries. GraphQL has no team
+        invitations, so they are read from the org invitations instead
+        of one request per team.
+        """
+        members = [m['login'] for m in self.graphql_nodes(
+            ORG_MEMBERS_QUERY, {'org': org},
+            ['organization', 'membersWithRole'])]
+
+        invitations = self.query('/orgs/{}/invitations'.format(org))
+        team_invitations = {}
+        for invitation in invitations:
+            login = invitation.get('login')
+            if login is None:
+                continue
+            members.append(login)
+            if not invitation.get('team_count'):
+                continue
+            teams = self.query('/orgs/{}/invitations/{}/teams'.format(
+                org, invitation['id']))
+            for team in teams:
+                team_invitations.setdefault(team['id'], []).append(login)
+
+        teams = []
+        for team in self.graphql_nodes(ORG_TEAMS_QUERY, {'org': org},
+                                       ['organization', 'teams']):
+            team_members = [m['login'] for m in team['members']['nodes']]
+            page_info = team['members']['pageInfo']
+            if page_info['hasNextPage']:
+                team_members.extend(m['login'] for m in self.graphql_nodes(
+                    TEAM_MEMBERS_QUERY, {'org': org, 'slug': team['slug']},
+                    ['organization', 'team', 'members'],
+                    after=page_info['endCursor']))
+            team_members.extend(
+                team_invitations.get(team['databaseId'], []))
+            teams.append({'name': team['name'], 'members': team_members})
+
+        return {'members': members, 'teams': teams}
 
     def org_invitations(self, org):
         invitations = self.query('/orgs/{}/invitations'.format(org))
@@ -3,10 +3,14 @@ import base64
 import logging
 import json
 import os
+import re
+import hashlib
+import subprocess
+import time
 
 from utils.openshift_resource import OpenshiftResource
 
-from python_terraform import Terraform
+from python_terraform import Terraform, IsFlagged
 from multiprocessing.dummy import Pool as ThreadPool
 from functools import partial
 from threading import Lock
@@ -27,17 +31,28 @@ class OR(OpenshiftResource):
 
 
 class TerraformClient(object):
+    INIT_FINGERPRINT_FILE = '.terraform/qontract-init'
+    PLAN_FILE = 'qontract.tfplan'
+    PLAN_STATE_FILE = 'qontract-plan-state.json'
+    FULL_PLAN_INTERVAL = 6 * 60 * 60
+    SHOW_JSON_VERSION = (0, 12)
+
     def __init__(self, integration, integration_version,
                  integration_prefix, working_dirs, thread_pool_size,
-                 init_users=False):
+                 init_users=False, plugin_cache_dir=None,
+                 keep_working_dirs=False, apply_thread_pool_size=5):
         self.integration = integration
         self.integration_version = integration_version
         self.integration_prefix = integration_prefix
         self.working_dirs = working_dirs
+        self.keep_working_dirs = keep_working_dirs
         self.parallelism = thread_pool_size
         self.pool = ThreadPool(thread_pool_size)
+        self.apply_thread_pool_size = apply_thread_pool_size
+        self.show_json = False
         self._log_lock = Lock()
 
+        self.init_plugin_cache(plugin_cache_dir)
         self.init_specs()
         self.init_outputs()
 
@@ -61,7 +76,7 @@ class TerraformClient(object):
 
     def get_new_users(self):
         new_users = []
-        self.init_outputs()  # get updated output
+        self.refresh_outputs()  # get updated output
         for account, output in self.outputs.items():
             existing_users = self.users[account]
             user_passwords = self.format_output(
@@ -75,27 +90,101 @@ class TerraformClient(object):
                                   user_name, enc_password))
         return new_users
 
+    def init_plugin_cache(self, plugin_cache_dir):
+        # providers are downloaded once to the plugin cache
+        # and shared by all accounts (and all runs)
+        self.plugin_cache_dir = plugin_cache_dir
+        if plugin_cache_dir is None:
+            return
+        if not os.path.exists(plugin_cache_dir):
+            os.makedirs(plugin_cache_dir)
+        os.environ['TF_PLUGIN_CACHE_DIR'] = os.path.abspath(plugin_cache_dir)
+
     def init_specs(self):
         wd_specs = \
             [{'name': name, 'wd': wd}
              for name, wd in self.working_dirs.items()]
-        results = self.pool.map(self.terraform_init, wd_specs)
+        results = []
+        if self.plugin_cache_dir is not None:
+            # the plugin cache is not safe for concurrent downloads
+            # of the same provider. initialize a single account per
+            # provider version first, the rest will use the cache
+            warmup_specs, wd_specs = self.split_warmup_specs(wd_specs)
+            results.extend([self.terraform_init(s) for s in warmup_specs])
+        results.extend(self.pool.map(self.terraform_init, wd_specs))
         self.specs = \
             [{'name': name, 'tf': tf} for name, tf in results]
 
+    def split_warmup_specs(self, wd_specs):
+        warmup_specs = []
+        other_specs = []
+        provider_versions = set()
+        for wd_spec in wd_specs:
+            config = self.read_config(wd_spec['wd'])
+            providers = config.get('provider', {}).get('aws', {})
+            version = json.dumps(
+                [p.get('version') for p in providers.values()])
+            if version in provider_versions:
+                other_specs.append(wd_spec)
+            else:
+                provider_versions.add(version)
+                warmup_specs.append(wd_spec)
+        return warmup_specs, other_specs
+
     def terraform_init(self, init_spec):
         name = init_spec['name']
         wd = init_spec['wd']
         tf = Terraform(working_dir=wd)
+        fingerprint = self.init_fingerprint(wd)
+        if self.is_initialized(wd, fingerprint):
+            with self._log_lock:
+                logging.debug('[{}] already initialized'.format(name))
+            return name, tf
         return_code, stdout, stderr = tf.init()
         error = self.check_output(name, return_code, stdout, stderr)
         if error:
             return name, None
+        self.write_init_fingerprint(wd, fingerprint)
         return name, tf
 
+    @staticmethod
+    def read_config(wd):
+        with open(os.path.join(wd, 'config.tf'), 'r') as f:
+            return json.load(f)
+
+    def init_fingerprint(self, wd):
+        # 'terraform init' only depends on the backend
+        # and provider configurations
+        config = self.read_config(wd)
+        init_config = {k: config.get(k) for k in ('terraform', 'provider')}
+        init_config = json.dumps(init_config, sort_keys=True)
+        return hashlib.sha256(init_config.encode('utf-8')).hexdigest()
+
+    def is_initialized(self, wd, fingerprint):
+        fingerprint_file = os.path.join(wd, self.INIT_FINGERPRINT_FILE)
+        if not os.path.exists(fingerprint_file):
+            return False
+        with open(fingerprint_file, 'r') as f:
+            return f.read().strip() == fingerprint
+
+    def write_init_fingerprint(self, wd, fingerprint):
+        fingerprint_file = os.path.join(wd, self.INIT_FINGERPRINT_FILE)
+        with open(fingerprint_file, 'w') as f:
+            f.write(fingerprint)
+
     def init_outputs(self):
         results = self.pool.map(self.terraform_output, self.specs)
         self.outputs = {name: output for name, output in results}
+        self.stale_outputs = set()
+
+    def refresh_outputs(self):
+        # outputs only change when an account is applied,
+        # all other accounts keep the outputs that were already read
+        specs = [spec for spec in self.specs
+                 if spec['name'] in self.stale_outputs]
+        results = self.pool.map(self.terraform_output, specs)
+        self.outputs.update({name: output for name, output in results})
+        self.stale_outputs = set()
 
     def terraform_output(self, spec):
         name = spec['name']
@@ -108,6 +197,10 @@ class TerraformClient(object):
         errors = False
         deletions_detected = False
 
+        version = self.terraform_version()
+        self.show_json = \
+            version is not None and version >= self.SHOW_JSON_VERSION
+
         terraform_plan_partial = partial(self.terraform_plan,
                                          enable_deletion=enable_deletion)
         results = self.pool.map(terraform_plan_partial, self.specs)
@@ -121,6 +214,18 @@ class TerraformClient(object):
                 self.deleted_users.extend(deleted_users)
         return deletions_detected, errors
 
+    @staticmethod
+    def terraform_version():
+        try:
+            output = subprocess.check_output(['terraform', 'version'],
+                                             universal_newlines=True)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        match = re.match(r'Terraform v(\d+)\.(\d+)', output)
+        if match is None:
+            return None
+        return tuple(int(v) for v in match.groups())
+
     def dump_deleted_users(self, io_dir):
         if not self.deleted_users:
             return
@@ -133,83 +238,218 @@ class TerraformClient(object):
     def terraform_plan(self, plan_spec, enable_deletion):
         name = plan_spec['name']
         tf = plan_spec['tf']
+        plan_spec['skip'] = self.is_unchanged(tf)
+        if plan_spec['skip']:
+            with self._log_lock:
+                logging.debug('[{}] config and state unchanged, '
+                              'skipping plan'.format(name))
+            return False, [], False
+        self.remove_plan_state(tf)
+        # the plan is saved to be applied as is,
+        # so apply does not need to refresh and plan again
         return_code, stdout, stderr = tf.plan(detailed_exitcode=False,
-                                              parallelism=self.parallelism)
+                                              parallelism=self.parallelism,
+                                              out=self.PLAN_FILE)
         error = self.check_output(name, return_code, stdout, stderr)
+        changes = self.plan_changes(tf, stdout, error)
         deletion_detected, deleted_users = \
-            self.log_plan_diff(name, stdout, enable_deletion)
+            self.log_plan_diff(name, changes, enable_deletion)
         return deletion_detected, deleted_users, error
 
-    def log_plan_diff(self, name, stdout, enable_deletion):
+    def plan_changes(self, tf, stdout, error):
+        # terraform >= 0.12 can show the saved plan in its machine readable
+        # representation. older versions only have the human readable output
+        if self.show_json and not error:
+            plan = self.show_plan_json(tf)
+            if plan is not None:
+                return self.parse_plan_json(plan)
+        return self.parse_plan_text(stdout)
+
+    def show_plan_json(self, tf):
+        # the plan is parsed from the pipe, without keeping
+        # a copy of the whole output as a string
+        cmd = tf.generate_cmd_string('show', self.PLAN_FILE, json=IsFlagged)
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.Popen(cmd, cwd=tf.working_dir,
+                                    stdout=subprocess.PIPE, stderr=devnull,
+                                    universal_newlines=True)
+            try:
+                plan = json.load(proc.stdout)
+            except ValueError:
+                plan = None
+            finally:
+                proc.stdout.close()
+                proc.wait()
+        if proc.returncode != 0:
+            return None
+        return plan
+
+    @staticmethod
+    def parse_plan_json(plan):
+        for resource_change in plan.get('resource_changes') or []:
+            if resource_change.get('mode') != 'managed':
+                continue
+            actions = resource_change['change']['actions']
+            if actions == ['create']:
+                action = 'create'
+            elif actions == ['update']:
+                action = 'update'
+            elif actions == ['delete']:
+                action = 'destroy'
+            elif sorted(actions) == ['create', 'delete']:
+                action = 'replace'
+            else:
+                # no-op and read
+                continue
+            yield action, resource_change['type'], resource_change['name']
+
+    @staticmethod
+    def parse_plan_text(stdout):
+        if not stdout:
+            return
+        prefixes = [('-/+ ', 'replace'), ('+ ', 'create'),
+                    ('- ', 'destroy'), ('~ ', 'update')]
+        for line in stdout.splitlines():
+            line = line.strip()
+            for prefix, action in prefixes:
+                if not line.startswith(prefix + 'aws'):
+                    continue
+                resource = line[len(prefix):].split(' ', 1)[0]
+                resource_type, resource_name = resource.split('.')
+                yield action, resource_type, resource_name
+                break
+
+    def log_plan_diff(self, name, changes, enable_deletion):
         deletions_detected = False
         deleted_users = []
-        stdout = self.split_to_lines(stdout)
         with self._log_lock:
-            for line in stdout:
-                line = line.strip()
-                if line.startswith('+ aws'):
-                    resource_type, resource_name = \
-                        line.replace('+ ', '').split('.')
-                    logging.info(['create', name,
+            for action, resource_type, resource_name in changes:
+                if action in ['create', 'update']:
+                    logging.info([action, name,
                                   resource_type, resource_name])
-                if line.startswith('- aws'):
-                    resource_type, resource_name = \
-                        line.replace('- ', '').split('.')
-                    if enable_deletion:
-                        logging.info(['destroy', name,
-                                      resource_type, resource_name])
-                        if resource_type == 'aws_iam_user':
-                            deleted_users.append({
-                                'account': name,
-                                'user': resource_name
-                            })
-                    else:
-                        logging.error(['destroy', name,
-                                       resource_type, resource_name])
-                        logging.error('\'destroy\' action is not enabled. ' +
-                                      'Please run the integration manually ' +
-                                      'with the \'--enable-deletion\' flag.')
-                    deletions_detected = True
-                if line.startswith('~ aws'):
-                    resource_type, resource_name = \
-                        line.replace('~ ', '').split('.')
-                    logging.info(['update', name,
+                    continue
+                # destroy and replace
+                if enable_deletion:
+                    logging.info([action, name,
                                   resource_type, resource_name])
-                if line.startswith('-/+ aws'):
-                    resource_type, resource_name = \
-                        line.replace('-/+ ', '').split('.')
-                    resource_name = resource_name.split(' ', 1)[0]
-                    if enable_deletion:
-                        logging.info(['replace', name,
-                                      resource_type, resource_name])
-                    else:
-                        logging.error(['replace', name,
-                                       resource_type, resource_name])
-                        logging.error('\'replace\' action is not enabled. ' +
-                                      'Please run the integration manually ' +
-                                      'with the \'--enable-deletion\' flag.')
-                    deletions_detected = True
+                    if action == 'destroy' and \
+                            resource_type == 'aws_iam_user':
+                        deleted_users.append({
+                            'account': name,
+                            'user': resource_name
+                        })
+                else:
+                    logging.error([action, name,
+                                   resource_type, resource_name])
+                    logging.error('\'{}\' action is not enabled. '
+                                  'Please run the integration manually '
+                                  'with the \'--enable-deletion\' '
+                                  'flag.'.format(action))
+                deletions_detected = True
         return deletions_detected, deleted_users
 
     # terraform apply
     def apply(self):
         errors = False
 
-        self.pool = ThreadPool(1)  # TODO: remove this
-        results = self.pool.map(self.terraform_apply, self.specs)
+        # accounts have separate backends and are applied in parallel.
+        # an error in one account does not stop the applies in the others,
+        # it is reported once all applies are done.
+        pool = ThreadPool(self.apply_thread_pool_size)
+        results = pool.map(self.safe_terraform_apply, self.specs)
 
         for error in results:
             if error:
                 errors = True
         return errors
 
+    def safe_terraform_apply(self, apply_spec):
+        try:
+            return self.terraform_apply(apply_spec)
+        except Exception as e:
+            with self._log_lock:
+                logging.error('[{}] {}'.format(apply_spec['name'], e))
+            return True
+
     def terraform_apply(self, apply_spec):
         name = apply_spec['name']
         tf = apply_spec['tf']
-        return_code, stdout, stderr = tf.apply(auto_approve=True)
+        if apply_spec.get('skip'):
+            return False
+        # the saved plan is applied even if it has no resource changes,
+        # changes to outputs alone are not reported as plan changes
+        self.stale_outputs.add(name)
+        return_code, stdout, stderr = tf.apply(dir_or_plan=self.PLAN_FILE,
+                                               auto_approve=True)
         error = self.check_output(name, return_code, stdout, stderr)
+        # a saved plan can only be applied once
+        self.remove_plan_file(tf.working_dir)
+        if not error:
+            self.write_plan_state(tf)
         return error
 
+    def remove_plan_file(self, wd):
+        # the saved plan contains sensitive values
+        plan_file = os.path.join(wd, self.PLAN_FILE)
+        if os.path.exists(plan_file):
+            os.remove(plan_file)
+
+    # the fingerprint of an account is made of the rendered config and
+    # the version of the remote state. it is only recorded after a
+    # successful apply, when the remote state and outputs are known to
+    # match the config, and it is removed before every plan. accounts
+    # with an unchanged fingerprint are not planned nor applied, unless
+    # the last full plan is older than FULL_PLAN_INTERVAL (to catch drift).
+    # this requires persistent working directories.
+    def state_fingerprint(self, tf):
+        return_code, stdout, _ = tf.cmd('state pull')
+        if return_code != 0:
+            return None
+        try:
+            state = json.loads(stdout) if stdout.strip() else {}
+        except ValueError:
+            return None
+        with open(os.path.join(tf.working_dir, 'config.tf'), 'rb') as f:
+            config = hashlib.sha256(f.read()).hexdigest()
+        return {
+            'config': config,
+            'serial': state.get('serial'),
+            'lineage': state.get('lineage')
+        }
+
+    def is_unchanged(self, tf):
+        if not self.keep_working_dirs:
+            return False
+        plan_state_file = os.path.join(tf.working_dir, self.PLAN_STATE_FILE)
+        if not os.path.exists(plan_state_file):
+            return False
+        try:
+            with open(plan_state_file, 'r') as f:
+                plan_state = json.load(f)
+        except ValueError:
+            return False
+        if time.time() - plan_state['timestamp'] > self.FULL_PLAN_INTERVAL:
+            return False
+        fingerprint = self.state_fingerprint(tf)
+        return fingerprint is not None and \
+            fingerprint == plan_state['fingerprint']
+
+    def write_plan_state(self, tf):
+        if not self.keep_working_dirs:
+            return
+        fingerprint = self.state_fingerprint(tf)
+        if fingerprint is None:
+            return
+        plan_state = {'fingerprint': fingerprint, 'timestamp': time.time()}
+        plan_state_file = os.path.join(tf.working_dir, self.PLAN_STATE_FILE)
+        with open(plan_state_file, 'w') as f:
+            json.dump(plan_state, f)
+
+    def remove_plan_state(self, tf):
+        plan_state_file = os.path.join(tf.working_dir, self.PLAN_STATE_FILE)
+        if os.path.exists(plan_state_file):
+            os.remove(plan_state_file)
+
     def get_terraform_output_secrets(self):
         data = {}
         for account, output in self.outputs.items():
@@ -219,7 +459,7 @@ class TerraformClient(object):
         return data
 
     def populate_desired_state(self, ri):
-        self.init_outputs()  # get updated output
+        self.refresh_outputs()  # get updated output
         for account, output in self.outputs.items():
             formatted_output = self.format_output(
                 output, self.OUTPUT_TYPE_SECRETS)
@@ -333,14 +573,17 @@ class TerraformClient(object):
     def check_output(self, name, return_code, stdout, stderr):
         error_occured = False
         line_format = '[{}] {}'
-        stdout, stderr = self.split_to_lines(stdout, stderr)
+        stderr = self.split_to_lines(stderr)
         with self._log_lock:
-            for line in stdout:
-                # this line will be present when performing 'terraform apply'
-                # as it will contain sensitive information, skip printing
-                if line.startswith('Outputs:'):
-                    break
-                logging.debug(line_format.format(name, line))
+            # stdout (e.g. a whole plan) is only split when it is logged
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for line in self.split_to_lines(stdout):
+                    # this line will be present when performing
+                    # 'terraform apply' as it will contain sensitive
+                    # information, skip printing
+                    if line.startswith('Outputs:'):
+                        break
+                    logging.debug(line_format.format(name, line))
             if return_code == 0:
                 for line in stderr:
                     logging.warning(line_format.format(name, line))
@@ -365,4 +608,8 @@ class TerraformClient(object):
 
     def cleanup(self):
         for _, wd in self.working_dirs.items():
-            shutil.rmtree(wd)
+            if self.keep_working_dirs:
+                # plans that were not applied must not be left behind
+                self.remove_plan_file(wd)
+            else:
+                shutil.rmtree(wd)
@@ -1,5 +1,8 @@
+import os
+import copy
 import tempfile
 import random
+import hashlib
 import string
 import base64
 import json
@@ -11,7 +14,7 @@ import utils.vault_client as vault_client
 
 from utils.config import get_config
 from utils.oc import StatusCodeError
-from utils.gpg import gpg_key_valid
+from utils.gpg import gpg_key_valid, gpg_key_digest
 
 from terrascript import Terrascript, provider, terraform, backend, output
 from terrascript.aws.r import (aws_db_instance, aws_s3_bucket, aws_iam_user,
@@ -39,13 +42,36 @@ class UnknownProviderError(Exception):
         )
 
 
+class HashedFile(object):
+    """File object wrapper that hashes everything written to it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data.encode('utf-8'))
+        self.f.write(data)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
 class TerrascriptClient(object):
     def __init__(self, integration, integration_prefix,
-                 thread_pool_size, oc_map={}):
+                 thread_pool_size, oc_map={}, working_dir=None, ri=None):
         self.integration = integration
         self.integration_prefix = integration_prefix
         self.oc_map = oc_map
+        self.ri = ri
         self.thread_pool_size = thread_pool_size
+        self.working_dir = working_dir
+        self.validated_configs = {}
+        self.tf_iam_groups = {}
+        self.tf_iam_users = {}
+        self.values = {}
+        self._values_lock = Lock()
+        self.gpg_keys_valid = {}
         self.populate_configs_and_vars_from_vault()
         tss = {}
         locks = {}
@@ -108,20 +134,26 @@ class TerrascriptClient(object):
         return (account, type, secret)
 
     def get_tf_iam_group(self, group_name):
-        return aws_iam_group(
-            group_name,
-            name=group_name
-        )
+        # groups and users are referenced by every membership,
+        # a single object is created per name
+        if group_name not in self.tf_iam_groups:
+            self.tf_iam_groups[group_name] = aws_iam_group(
+                group_name,
+                name=group_name
+            )
+        return self.tf_iam_groups[group_name]
 
     def get_tf_iam_user(self, user_name):
-        return aws_iam_user(
-            user_name,
-            name=user_name,
-            force_destroy=True,
-            tags={
-                'managed_by_integration': self.integration
-            }
-        )
+        if user_name not in self.tf_iam_users:
+            self.tf_iam_users[user_name] = aws_iam_user(
+                user_name,
+                name=user_name,
+                force_destroy=True,
+                tags={
+                    'managed_by_integration': self.integration
+                }
+            )
+        return self.tf_iam_users[user_name]
 
     def populate_iam_groups(self, tf_query):
         groups = {}
@@ -159,6 +191,58 @@ class TerrascriptClient(object):
                     groups[account_name][group_name] = 'Done'
         return groups
 
+    def init_gpg_keys_valid(self, tf_query):
+        # users may be in many roles, validate each distinct key once
+        self.gpg_keys_valid = self.read_gpg_keys_valid()
+        keys = {}
+        for role in tf_query:
+            for user in role['users']:
+                key = user['public_gpg_key']
+                if key is None:
+                    continue
+                digest = gpg_key_digest(key)
+                if digest not in self.gpg_keys_valid:
+                    keys[digest] = key
+
+        pool = ThreadPool(self.thread_pool_size)
+        results = pool.map(gpg_key_valid, keys.values())
+        self.gpg_keys_valid.update(zip(keys.keys(), results))
+        self.write_gpg_keys_valid()
+
+    def gpg_keys_valid_file(self):
+        if self.working_dir is None:
+            return None
+        return os.path.join(self.working_dir, self.integration,
+                            'gpg-keys-valid.json')
+
+    def read_gpg_keys_valid(self):
+        path = self.gpg_keys_valid_file()
+        if path is None or not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            gpg_keys_valid = json.load(f)
+        return {d: v for d, v in gpg_keys_valid.items() if v}
+
+    def write_gpg_keys_valid(self):
+        path = self.gpg_keys_valid_file()
+        if path is None:
+            return
+        dir = os.path.dirname(path)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        # invalid results may come from a temporary gpg failure,
+        # only valid keys are kept between runs
+        gpg_keys_valid = \
+            {d: v for d, v in self.gpg_keys_valid.items() if v}
+        with open(path, 'w') as f:
+            json.dump(gpg_keys_valid, f)
+
+    def is_gpg_key_valid(self, public_gpg_key):
+        digest = gpg_key_digest(public_gpg_key)
+        if digest not in self.gpg_keys_valid:
+            self.gpg_keys_valid[digest] = gpg_key_valid(public_gpg_key)
+        return self.gpg_keys_valid[digest]
+
     def populate_iam_users(self, tf_query):
         for role in tf_query:
             users = role['users']
@@ -211,7 +295,7 @@ class TerrascriptClient(object):
                                 user_name)
                         logging.warning(msg)
                         continue
-                    if not gpg_key_valid(user_public_gpg_key):
+                    if not self.is_gpg_key_valid(user_public_gpg_key):
                         msg = \
                             'user {} has an invalid public gpg key.'.format(
                                 user_name)
@@ -271,6 +355,7 @@ class TerrascriptClient(object):
                                           tf_aws_iam_user_policy)
 
     def populate_users(self, tf_query):
+        self.init_gpg_keys_valid(tf_query)
         self.populate_iam_groups(tf_query)
         err = self.populate_iam_users(tf_query)
         if err:
@@ -280,6 +365,10 @@ class TerrascriptClient(object):
         populate_specs = self.init_populate_specs(tf_query)
 
         pool = ThreadPool(self.thread_pool_size)
+        # many resources share a few defaults files, fetch each one once
+        defaults_paths = \
+            set(spec['resource']['defaults'] for spec in populate_specs)
+        pool.map(self.get_values, defaults_paths)
         populate_tf_resources_partial = \
             partial(self.populate_tf_resources,
                     existing_secrets=existing_secrets)
@@ -385,6 +474,15 @@ class TerrascriptClient(object):
 
     def fetch_existing_oc_resource(self, namespace_info, resource_name):
         cluster, namespace = self.unpack_namespace_info(namespace_info)
+        # Secrets of the namespace were already fetched to the inventory,
+        # oc is only used for namespaces that are not in it
+        if self.ri is not None:
+            try:
+                resource = self.ri.get_current(cluster, namespace,
+                                               'Secret', resource_name)
+                return None if resource is None else resource.body
+            except KeyError:
+                pass
         try:
             oc = self.oc_map[cluster]
             return oc.get(namespace, 'Secret', resource_name)
@@ -533,24 +631,54 @@ class TerrascriptClient(object):
             working_dirs = {}
         else:
             working_dirs = existing_dirs
+        validate_specs = []
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         for name, ts in self.tss.items():
             if print_only:
                 print('##### {} #####'.format(name))
                 print(ts.dump())
                 continue
             if existing_dirs is None:
-                wd = tempfile.mkdtemp()
+                wd = self.init_working_dir(name)
             else:
                 wd = working_dirs[name]
+            working_dirs[name] = wd
             with open(wd + '/config.tf', 'w') as f:
-                f.write(ts.dump())
-            valid = ts.validate(wd)
+                hf = HashedFile(f)
+                ts.dump_to(hf, debug=debug)
+            # a config that was already validated in this
+            # working directory does not need to be validated again
+            config_hash = hf.hexdigest()
+            if self.validated_configs.get(wd) == config_hash:
+                continue
+            validate_specs.append({'ts': ts, 'wd': wd, 'hash': config_hash})
+
+        pool = ThreadPool(self.thread_pool_size)
+        results = pool.map(self.validate, validate_specs)
+        for valid in results:
             if not valid:
-                error = not valid
-            working_dirs[name] = wd
+                error = True
 
         return working_dirs, error
 
+    def validate(self, validate_spec):
+        ts = validate_spec['ts']
+        wd = validate_spec['wd']
+        valid = ts.validate(wd)
+        if valid:
+            self.validated_configs[wd] = validate_spec['hash']
+        return valid
+
+    def init_working_dir(self, account):
+        # a persistent working directory keeps the '.terraform' directory
+        # between runs, so 'terraform init' does not have to be repeated
+        if self.working_dir is None:
+            return tempfile.mkdtemp()
+        wd = os.path.join(self.working_dir, self.integration, account)
+        if not os.path.exists(wd):
+            os.makedirs(wd)
+        return wd
+
     def init_values(self, resource, namespace_info):
         account = resource['account']
         provider = resource['provider']
@@ -612,6 +740,17 @@ class TerrascriptClient(object):
         tf_resources.append(output(output_name, value=output_value))
 
     def get_values(self, path):
+        # parsed defaults are cached per path,
+        # every caller gets its own copy to modify
+        with self._values_lock:
+            values = self.values.get(path)
+        if values is None:
+            values = self.fetch_values(path)
+            with self._values_lock:
+                values = self.values.setdefault(path, values)
+        return copy.deepcopy(values)
+
+    def fetch_values(self, path):
         gqlapi = gql.get_api()
         try:
             raw_values = gqlapi.get_resource(path)